@@ -0,0 +1,36 @@
+"""add receipt_scan_cache table
+
+Revision ID: 2f6a9c83e5b1
+Revises: 9b7d4e61c0a2
+Create Date: 2026-10-17 14:02:51.730264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6a9c83e5b1'
+down_revision: Union[str, Sequence[str], None] = '9b7d4e61c0a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'receipt_scan_cache',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('result', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index(op.f('ix_receipt_scan_cache_cache_key'), 'receipt_scan_cache', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_receipt_scan_cache_created_at'), 'receipt_scan_cache', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_receipt_scan_cache_created_at'), table_name='receipt_scan_cache')
+    op.drop_index(op.f('ix_receipt_scan_cache_cache_key'), table_name='receipt_scan_cache')
+    op.drop_table('receipt_scan_cache')
@@ -0,0 +1,149 @@
+"""add trip_balances ledger
+
+Revision ID: 5c1e8a2f7d34
+Revises: 3aedffe93b0f
+Create Date: 2026-10-17 09:12:40.218311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e8a2f7d34'
+down_revision: Union[str, Sequence[str], None] = '3aedffe93b0f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copies of the tables and split logic as of this revision, so the
+# backfill keeps its meaning when app.models / app.balances change later.
+trips = sa.table('trips', sa.column('id', sa.Integer), sa.column('currency', sa.String))
+expenses = sa.table(
+    'expenses',
+    sa.column('id', sa.Integer),
+    sa.column('trip_id', sa.Integer),
+    sa.column('amount', sa.Integer),
+    sa.column('paid_by_id', sa.Integer),
+    sa.column('split_method', sa.String),
+    sa.column('currency', sa.String),
+)
+expense_members = sa.table(
+    'expense_members',
+    sa.column('id', sa.Integer),
+    sa.column('expense_id', sa.Integer),
+    sa.column('member_id', sa.Integer),
+    sa.column('split_value', sa.Numeric),
+)
+settlements = sa.table(
+    'settlements',
+    sa.column('id', sa.Integer),
+    sa.column('trip_id', sa.Integer),
+    sa.column('from_member_id', sa.Integer),
+    sa.column('to_member_id', sa.Integer),
+    sa.column('amount', sa.Integer),
+    sa.column('currency', sa.String),
+)
+trip_balances = sa.table(
+    'trip_balances',
+    sa.column('trip_id', sa.Integer),
+    sa.column('currency', sa.String),
+    sa.column('member_id', sa.Integer),
+    sa.column('balance', sa.Integer),
+    sa.column('entry_count', sa.Integer),
+)
+
+
+def _split(total, method, members, details):
+    result = {}
+    if method == 'even':
+        if members:
+            base, remainder = divmod(total, len(members))
+            for i, mid in enumerate(members):
+                result[mid] = base + (1 if i < remainder else 0)
+    elif method == 'percentage':
+        allocated = 0
+        for i, mid in enumerate(members):
+            if i == len(members) - 1:
+                result[mid] = total - allocated
+            else:
+                result[mid] = int(total * details.get(mid, 0) / 100 + 0.5)
+                allocated += result[mid]
+    elif method == 'amount':
+        for mid in members:
+            result[mid] = int(details.get(mid, 0))
+    elif method == 'ratio':
+        total_weight = sum(details.get(mid, 0) for mid in members)
+        allocated = 0
+        for i, mid in enumerate(members):
+            if total_weight == 0:
+                result[mid] = 0
+            elif i == len(members) - 1:
+                result[mid] = total - allocated
+            else:
+                result[mid] = int(total * details.get(mid, 0) / total_weight + 0.5)
+                allocated += result[mid]
+    return result
+
+
+def _backfill(conn) -> None:
+    trip_currency = dict(conn.execute(sa.select(trips.c.id, trips.c.currency)).all())
+
+    members: dict = {}  # expense id -> ([member ids], {member id: split value})
+    for expense_id, member_id, split_value in conn.execute(
+        sa.select(expense_members.c.expense_id, expense_members.c.member_id, expense_members.c.split_value)
+        .order_by(expense_members.c.id)
+    ):
+        involved, details = members.setdefault(expense_id, ([], {}))
+        involved.append(member_id)
+        if split_value is not None:
+            details[member_id] = float(split_value)
+
+    legs: dict = {}  # trip id -> [(currency, member id, amount)]
+    for expense in conn.execute(sa.select(expenses).order_by(expenses.c.id)):
+        currency = expense.currency or trip_currency[expense.trip_id]
+        involved, details = members.get(expense.id, ([], {}))
+        trip_legs = legs.setdefault(expense.trip_id, [])
+        trip_legs.append((currency, expense.paid_by_id, expense.amount))
+        for member_id, share in _split(expense.amount, expense.split_method, involved, details).items():
+            trip_legs.append((currency, member_id, -share))
+    for settlement in conn.execute(sa.select(settlements).order_by(settlements.c.id)):
+        currency = settlement.currency or trip_currency[settlement.trip_id]
+        legs.setdefault(settlement.trip_id, []).extend([
+            (currency, settlement.from_member_id, settlement.amount),
+            (currency, settlement.to_member_id, -settlement.amount),
+        ])
+
+    rows = []
+    for trip_id, trip_legs in legs.items():
+        totals: dict = {}
+        for currency, member_id, amount in trip_legs:
+            total = totals.setdefault((currency, member_id), [0, 0])
+            total[0] += amount
+            total[1] += 1
+        rows.extend(
+            {'trip_id': trip_id, 'currency': currency, 'member_id': member_id, 'balance': balance, 'entry_count': count}
+            for (currency, member_id), (balance, count) in totals.items()
+        )
+    if rows:
+        op.bulk_insert(trip_balances, rows)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'trip_balances',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('trip_id', sa.Integer(), sa.ForeignKey('trips.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('member_id', sa.Integer(), sa.ForeignKey('members.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('balance', sa.Integer(), nullable=False),
+        sa.Column('entry_count', sa.Integer(), nullable=False),
+        sa.UniqueConstraint('trip_id', 'currency', 'member_id'),
+    )
+
+    _backfill(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_table('trip_balances')
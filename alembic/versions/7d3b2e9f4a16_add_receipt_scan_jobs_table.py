@@ -0,0 +1,48 @@
+"""add receipt_scan_jobs table
+
+Revision ID: 7d3b2e9f4a16
+Revises: 2f6a9c83e5b1
+Create Date: 2026-10-17 15:21:08.114902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3b2e9f4a16'
+down_revision: Union[str, Sequence[str], None] = '2f6a9c83e5b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'receipt_scan_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('token', sa.String(length=32), nullable=False),
+        sa.Column('trip_id', sa.Integer(), sa.ForeignKey('trips.id'), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('image', sa.LargeBinary(), nullable=True),
+        sa.Column('content_type', sa.String(length=50), nullable=False),
+        sa.Column('language', sa.String(length=35), nullable=False),
+        sa.Column('fallback_currency', sa.String(length=3), nullable=False),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.String(length=255), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index(op.f('ix_receipt_scan_jobs_token'), 'receipt_scan_jobs', ['token'], unique=True)
+    op.create_index(op.f('ix_receipt_scan_jobs_trip_id'), 'receipt_scan_jobs', ['trip_id'], unique=False)
+    op.create_index('ix_receipt_scan_jobs_status_created_at', 'receipt_scan_jobs', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_receipt_scan_jobs_status_created_at', table_name='receipt_scan_jobs')
+    op.drop_index(op.f('ix_receipt_scan_jobs_trip_id'), table_name='receipt_scan_jobs')
+    op.drop_index(op.f('ix_receipt_scan_jobs_token'), table_name='receipt_scan_jobs')
+    op.drop_table('receipt_scan_jobs')
@@ -0,0 +1,42 @@
+"""add foreign key and lookup indexes
+
+Revision ID: 9b7d4e61c0a2
+Revises: 5c1e8a2f7d34
+Create Date: 2026-10-17 11:40:03.561907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b7d4e61c0a2'
+down_revision: Union[str, Sequence[str], None] = '5c1e8a2f7d34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# expense_members.expense_id is already covered by the leading column of
+# its (expense_id, member_id) unique constraint, as is trip_balances.trip_id.
+INDEXES = [
+    ('ix_members_trip_id', 'members', ['trip_id']),
+    ('ix_members_settled_by_id', 'members', ['settled_by_id']),
+    ('ix_expenses_trip_id', 'expenses', ['trip_id']),
+    ('ix_expenses_paid_by_id', 'expenses', ['paid_by_id']),
+    ('ix_expense_members_member_id', 'expense_members', ['member_id']),
+    ('ix_settlements_trip_id', 'settlements', ['trip_id']),
+    ('ix_settlements_from_member_id', 'settlements', ['from_member_id']),
+    ('ix_settlements_to_member_id', 'settlements', ['to_member_id']),
+    ('ix_user_trips_user_id_last_visited_at', 'user_trips', ['user_id', 'last_visited_at']),
+    ('ix_exchange_rates_pair_fetched_at', 'exchange_rates', ['base_currency', 'target_currency', 'fetched_at']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -2,10 +2,11 @@ import logging
 import secrets
 
 from fastapi import Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from app.database import get_db
-from app.models import Member, Trip, User
+from app.models import Expense, Member, Trip, User
+from app.user_cache import CachedUser, user_cache
 
 logger = logging.getLogger("yoyo")
 
@@ -24,9 +25,32 @@ def get_trip_by_token(
     return trip
 
 
+def get_trip_aggregate(access_token: str, db: Session, members_only: bool = False) -> Trip:
+    """Load a trip with its members, expenses (with splits) and settlements eagerly.
+
+    Uses one SELECT per relationship (5 total, or 2 with members_only) regardless
+    of how many expenses the trip has, instead of lazy-loading each collection.
+    """
+    options = [selectinload(Trip.members)]
+    if not members_only:
+        options += [
+            selectinload(Trip.expenses).selectinload(Expense.involved_members),
+            selectinload(Trip.settlements),
+        ]
+    trip = (
+        db.query(Trip)
+        .options(*options)
+        .filter(Trip.access_token == access_token, Trip.is_deleted == False)  # noqa: E712
+        .first()
+    )
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    return trip
+
+
 def verify_creator(trip: Trip, request: Request, db: Session) -> None:
     """Check that the current user is the trip creator via CTK-derived user."""
-    user = getattr(request.state, "user", None)
+    user = get_current_user(request, db)
     if user and trip.creator_member_id:
         creator_member = (
             db.query(Member)
@@ -45,14 +69,34 @@ def get_ctk(request: Request) -> str | None:
     return getattr(request.state, "ctk", None)
 
 
-def get_or_create_user(request: Request, db: Session) -> User | None:
+def get_current_user(request: Request, db: Session) -> CachedUser | None:
+    """Resolve the request's ctk to a user, at most once per request.
+
+    Served from user_cache when possible, so routes that only need the
+    user's id don't touch the database at all.
+    """
+    if hasattr(request.state, "user"):
+        return request.state.user
+    ctk = get_ctk(request)
+    user = user_cache.get(ctk) if ctk else None
+    if ctk and user is None:
+        row = db.query(User.id, User.name).filter(User.ctk == ctk).first()
+        if row:
+            user = CachedUser(row.id, row.name)
+            user_cache.put(ctk, user)
+    request.state.user = user
+    return user
+
+
+def get_or_create_user(request: Request, db: Session) -> CachedUser | None:
     """Look up or create a User for the request's ctk cookie."""
+    user = get_current_user(request, db)
     ctk = get_ctk(request)
-    if not ctk:
-        return None
-    user = db.query(User).filter(User.ctk == ctk).first()
-    if not user:
-        user = User(ctk=ctk)
-        db.add(user)
-        db.flush()
+    if user or not ctk:
+        return user
+    row = User(ctk=ctk)
+    db.add(row)
+    db.flush()
+    # Not cached until committed; the next request picks it up from the table
+    request.state.user = user = CachedUser(row.id, row.name)
     return user
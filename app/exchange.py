@@ -1,11 +1,21 @@
+import asyncio
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime, date as date_type, timedelta
 
-import httpx
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.database import SessionLocal
+from app.http_client import get_async_client, get_client
+from app.metrics import EXCHANGE_RATE_FETCH_SECONDS, EXCHANGE_RATE_LOOKUPS
 from app.models import ExchangeRate
+from app.timing import phase
 
 logger = logging.getLogger("yoyo")
 
@@ -15,98 +25,486 @@ SUPPORTED_CURRENCIES = (
     "KRW", "MXN", "MYR", "NOK", "NZD", "PHP", "PLN", "RON",
     "SEK", "SGD", "THB", "TRY", "TWD", "USD", "VND", "ZAR",
 )
-EXCHANGE_API_BASE = "https://open.er-api.com/v6/latest"
+EXCHANGE_API_BASE = os.getenv("EXCHANGE_API_BASE", "https://open.er-api.com/v6/latest")
+RATE_MAX_AGE = timedelta(hours=24)
+RATE_CACHE_MAX_ENTRIES = int(os.getenv("RATE_CACHE_MAX_ENTRIES", "4096"))
 
+# Background refresher: wake every interval (0 disables) and refetch any base
+# whose newest rates are older than RATE_REFRESH_AGE, well before they expire.
+EXCHANGE_REFRESH_INTERVAL = float(os.getenv("EXCHANGE_REFRESH_INTERVAL", "900"))
+RATE_REFRESH_AGE = timedelta(hours=12)
 
-def get_rate(db: Session, base: str, target: str) -> tuple[float, date_type]:
-    """Get exchange rate from cache or fetch from frankfurter.dev.
 
-    Returns (rate, date) tuple.
-    Rates are cached permanently; "latest" rates refresh if older than 24h.
+class ExchangeRateUnavailable(RuntimeError):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stop calling a failing upstream for `reset_timeout` seconds after
+    `failure_threshold` consecutive failures, then let one trial call through."""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: allow a trial call; a failure re-opens immediately
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning("Exchange rate circuit opened", extra={"extra_data": {"failures": self.failures}})
+                self.opened_at = time.monotonic()
+
+
+class RateCache:
+    """Process-local LRU of (base, target) -> (rate, date, fetched_at).
+
+    Entries expire RATE_MAX_AGE after fetched_at, the same cutoff as the
+    ExchangeRate table, so a warm worker serves rates with zero queries.
     """
-    if base == target:
-        return 1.0, date_type.today()
 
-    now = datetime.utcnow()
-    cutoff = now - timedelta(hours=24)
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[float, date_type, datetime]] = OrderedDict()
+        self._lock = threading.Lock()
 
-    # Check cache for a recent rate
-    cached = (
-        db.query(ExchangeRate)
-        .filter(
-            ExchangeRate.base_currency == base,
-            ExchangeRate.target_currency == target,
-            ExchangeRate.fetched_at >= cutoff,
-        )
-        .order_by(ExchangeRate.fetched_at.desc())
-        .first()
-    )
-    if cached:
-        return float(cached.rate), cached.date
+    def get(self, base: str, target: str) -> tuple[float, date_type] | None:
+        key = (base, target)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < datetime.utcnow() - RATE_MAX_AGE:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, base: str, target: str, rate: float, rate_date: date_type, fetched_at: datetime) -> None:
+        key = (base, target)
+        with self._lock:
+            self._entries[key] = (rate, rate_date, fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else None,
+            }
+
+
+rate_cache = RateCache(RATE_CACHE_MAX_ENTRIES)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and receive the same result (or exception). Threads
+    (do) and coroutines (do_async) share the same in-flight calls, so a
+    sync and an async miss for one key still make a single call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+        self._tasks: set[asyncio.Task] = set()
 
-    # Fetch from API
+    def _join(self, key: str) -> tuple[Future, bool]:
+        """Return the in-flight call for `key`, and whether the caller must run it."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = Future()
+            return call, True
+
+    def _finish(self, key: str) -> None:
+        with self._lock:
+            del self._calls[key]
+
+    def do(self, key: str, fn):
+        call, leader = self._join(key)
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key)
+            call.set_exception(e)
+            raise
+        self._finish(key)
+        call.set_result(result)
+        return result
+
+    async def do_async(self, key: str, fn):
+        """Like do(), but `fn` returns an awaitable and waiting doesn't block the loop."""
+        call, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(fn())
+            self._tasks.add(task)
+            task.add_done_callback(lambda t: self._settle(key, call, t))
+        # Shield so one cancelled waiter doesn't cancel the call for the others
+        return await asyncio.shield(asyncio.wrap_future(call))
+
+    def _settle(self, key: str, call: Future, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._finish(key)
+        if task.cancelled():
+            call.cancel()
+        elif task.exception() is not None:
+            call.set_exception(task.exception())
+        else:
+            call.set_result(task.result())
+
+
+rate_breaker = CircuitBreaker()
+rate_fetches = SingleFlight()
+
+
+def _parse_latest(data: dict) -> tuple[dict[str, float], date_type]:
+    rate_date = date_type.fromtimestamp(data["time_last_update_unix"]) if "time_last_update_unix" in data else date_type.today()
+    return data["rates"], rate_date
+
+
+def _fetch_latest(base: str) -> tuple[dict[str, float], date_type]:
+    """Fetch every rate for a base currency in one request to open.er-api.com."""
+    if not rate_breaker.allow():
+        raise ExchangeRateUnavailable(f"Exchange rate upstream unavailable (base {base})")
+    start = time.perf_counter()
     try:
-        resp = httpx.get(
-            f"{EXCHANGE_API_BASE}/{base}",
-            timeout=10,
-        )
+        resp = get_client().get(f"{EXCHANGE_API_BASE}/{base}")
         resp.raise_for_status()
+        data = resp.json()
     except Exception:
-        logger.error("Exchange rate fetch failed", extra={"extra_data": {"base": base, "target": target}}, exc_info=True)
+        EXCHANGE_RATE_FETCH_SECONDS.labels("error").observe(time.perf_counter() - start)
+        rate_breaker.record_failure()
+        logger.error("Exchange rate fetch failed", extra={"extra_data": {"base": base}}, exc_info=True)
         raise
-    data = resp.json()
+    EXCHANGE_RATE_FETCH_SECONDS.labels("ok").observe(time.perf_counter() - start)
+    rate_breaker.record_success()
+    return _parse_latest(data)
 
-    rate_value = data["rates"][target]
-    rate_date = date_type.fromtimestamp(data["time_last_update_unix"]) if "time_last_update_unix" in data else date_type.today()
 
-    # Upsert into cache
-    existing = (
-        db.query(ExchangeRate)
-        .filter(
+async def _fetch_latest_async(base: str) -> tuple[dict[str, float], date_type]:
+    """Async variant of _fetch_latest() that doesn't hold a worker thread."""
+    if not rate_breaker.allow():
+        raise ExchangeRateUnavailable(f"Exchange rate upstream unavailable (base {base})")
+    start = time.perf_counter()
+    try:
+        resp = await get_async_client().get(f"{EXCHANGE_API_BASE}/{base}")
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception:
+        EXCHANGE_RATE_FETCH_SECONDS.labels("error").observe(time.perf_counter() - start)
+        rate_breaker.record_failure()
+        logger.error("Exchange rate fetch failed", extra={"extra_data": {"base": base}}, exc_info=True)
+        raise
+    EXCHANGE_RATE_FETCH_SECONDS.labels("ok").observe(time.perf_counter() - start)
+    rate_breaker.record_success()
+    return _parse_latest(data)
+
+
+def _refresh_base(db: Session, base: str, extra: list[str] | None = None) -> tuple[dict[str, float], date_type]:
+    """Fetch all rates for a base and upsert every supported target in one commit.
+
+    `extra` adds targets outside SUPPORTED_CURRENCIES that the caller needs cached.
+    Concurrent refreshes of the same base share one fetch: only the first
+    caller hits upstream and writes rows, the rest wait for its result.
+    """
+    return rate_fetches.do(base, lambda: _fetch_and_store(db, base, extra))
+
+
+def _fetch_and_store(db: Session, base: str, extra: list[str] | None) -> tuple[dict[str, float], date_type]:
+    rates, rate_date = _fetch_latest(base)
+    return _store_rates(db, base, rates, rate_date, extra), rate_date
+
+
+async def _refresh_base_async(base: str, extra: list[str] | None = None) -> tuple[dict[str, float], date_type]:
+    """Like _refresh_base(), but awaits the network call on the event loop.
+
+    Shares rate_fetches with _refresh_base(), so a base already being fetched
+    by a worker thread or another coroutine is waited on, not fetched again.
+    """
+    return await rate_fetches.do_async(base, lambda: _fetch_and_store_async(base, extra))
+
+
+async def _fetch_and_store_async(base: str, extra: list[str] | None) -> tuple[dict[str, float], date_type]:
+    rates, rate_date = await _fetch_latest_async(base)
+
+    def store() -> dict[str, float]:
+        db = SessionLocal()
+        try:
+            return _store_rates(db, base, rates, rate_date, extra)
+        finally:
+            db.close()
+
+    return await asyncio.to_thread(store), rate_date
+
+
+def _store_rates(
+    db: Session, base: str, rates: dict[str, float], rate_date: date_type, extra: list[str] | None
+) -> dict[str, float]:
+    """Upsert every supported target (plus `extra`) for a base in one commit.
+
+    Returns the stored {target: rate}, rounded to the Numeric(18, 8) precision
+    readers get back from the table, so a fresh fetch and a later cache hit
+    serve identical values.
+    """
+    now = datetime.utcnow()
+    targets = [c for c in dict.fromkeys([*SUPPORTED_CURRENCIES, *(extra or [])]) if c != base and c in rates]
+    stored = {target: round(float(rates[target]), 8) for target in targets}
+
+    existing = {
+        row.target_currency: row
+        for row in db.query(ExchangeRate).filter(
             ExchangeRate.date == rate_date,
             ExchangeRate.base_currency == base,
-            ExchangeRate.target_currency == target,
+            ExchangeRate.target_currency.in_(targets),
         )
-        .first()
-    )
-    if existing:
-        existing.rate = rate_value
-        existing.fetched_at = now
-    else:
-        db.add(
-            ExchangeRate(
-                date=rate_date,
-                base_currency=base,
-                target_currency=target,
-                rate=rate_value,
-                fetched_at=now,
+    }
+    for target in targets:
+        row = existing.get(target)
+        if row:
+            row.rate = stored[target]
+            row.fetched_at = now
+        else:
+            db.add(
+                ExchangeRate(
+                    date=rate_date,
+                    base_currency=base,
+                    target_currency=target,
+                    rate=stored[target],
+                    fetched_at=now,
+                )
             )
-        )
     try:
         db.commit()
     except IntegrityError:
-        # Race condition: another request already inserted this rate
+        # Race condition: another request already inserted these rates
         db.rollback()
 
-    return float(rate_value), rate_date
+    for target, rate in stored.items():
+        rate_cache.put(base, target, rate, rate_date, now)
+    return stored
+
+
+def _cached_rates(db: Session, base: str, targets: list[str]) -> dict[str, tuple[float, date_type]]:
+    """Return the freshest non-expired {target: (rate, date)} for a base.
+
+    Checks the in-process cache first and only queries the table for misses.
+    """
+    cached: dict[str, tuple[float, date_type]] = {}
+    missing = []
+    for target in targets:
+        hit = rate_cache.get(base, target)
+        if hit is not None:
+            cached[target] = hit
+        else:
+            missing.append(target)
+    if not missing:
+        EXCHANGE_RATE_LOOKUPS.labels("memory").inc()
+        return cached
+
+    cutoff = datetime.utcnow() - RATE_MAX_AGE
+    rows = (
+        db.query(ExchangeRate)
+        .filter(
+            ExchangeRate.base_currency == base,
+            ExchangeRate.target_currency.in_(missing),
+            ExchangeRate.fetched_at >= cutoff,
+        )
+        .order_by(ExchangeRate.fetched_at.desc())
+        .all()
+    )
+    for row in rows:
+        if row.target_currency not in cached:
+            cached[row.target_currency] = (float(row.rate), row.date)
+            rate_cache.put(base, row.target_currency, float(row.rate), row.date, row.fetched_at)
+    EXCHANGE_RATE_LOOKUPS.labels("table" if len(cached) == len(targets) else "miss").inc()
+    return cached
+
+
+def _last_known_rates(db: Session, base: str, targets: list[str]) -> dict[str, tuple[float, date_type]]:
+    """Return the newest {target: (rate, date)} for a base regardless of age."""
+    rows = (
+        db.query(ExchangeRate)
+        .filter(
+            ExchangeRate.base_currency == base,
+            ExchangeRate.target_currency.in_(targets),
+        )
+        .order_by(ExchangeRate.fetched_at.desc())
+        .all()
+    )
+    known: dict[str, tuple[float, date_type]] = {}
+    for row in rows:
+        known.setdefault(row.target_currency, (float(row.rate), row.date))
+    return known
+
+
+def _stale_quotes(db: Session, target: str, needed: list[str]) -> tuple[dict[str, float], date_type] | None:
+    """Last known quotes for a target regardless of age, or None if any are missing."""
+    known = _last_known_rates(db, target, needed)
+    if not all(c in known for c in needed):
+        return None
+    logger.warning("Serving stale exchange rates", extra={"extra_data": {"base": target}})
+    return {c: rate for c, (rate, _) in known.items()}, min(d for _, d in known.values())
+
+
+def _invert(quotes: dict[str, float], needed: list[str]) -> dict[str, float]:
+    # quotes are 1 target = x currency; callers want 1 currency = y target
+    return {c: 1 / float(quotes[c]) for c in needed}
 
 
 def get_rates_for_currencies(
     db: Session, target: str, currencies: list[str]
-) -> tuple[dict[str, float], date_type | None]:
+) -> tuple[dict[str, float], date_type | None, bool]:
     """Get exchange rates from multiple currencies to a target currency.
 
-    Returns ({currency: rate}, date) where rate converts 1 unit of currency to target.
-    Only includes currencies different from target.
+    Returns ({currency: rate}, date, stale) where rate converts 1 unit of currency
+    to target. Only includes currencies different from target.
+
+    All rates are derived from the target's own quote (1 target = x currency),
+    so a cold cache costs a single upstream request however many currencies
+    the trip uses. If that request fails (or the circuit breaker is open), the
+    last known rates are returned with stale=True; only a trip with no rates
+    on record at all gets the error.
+    """
+    needed = sorted({c for c in currencies if c != target})
+    if not needed:
+        return {}, None, False
+
+    stale = False
+    with phase("exchange-fetch"):
+        cached = _cached_rates(db, target, needed)
+        if all(c in cached for c in needed):
+            quotes = {c: rate for c, (rate, _) in cached.items()}
+            rate_date = max(d for _, d in cached.values())
+        else:
+            try:
+                quotes, rate_date = _refresh_base(db, target, needed)
+            except Exception:
+                fallback = _stale_quotes(db, target, needed)
+                if fallback is None:
+                    raise
+                (quotes, rate_date), stale = fallback, True
+
+    return _invert(quotes, needed), rate_date, stale
+
+
+async def get_rates_for_currencies_async(
+    db: Session, target: str, currencies: list[str]
+) -> tuple[dict[str, float], date_type | None, bool]:
+    """Async variant of get_rates_for_currencies() for async routes.
+
+    Database work runs in a worker thread; the upstream fetch on a miss is
+    awaited on the shared AsyncClient, so no thread waits on the network.
+    """
+    needed = sorted({c for c in currencies if c != target})
+    if not needed:
+        return {}, None, False
+
+    stale = False
+    with phase("exchange-fetch"):
+        cached = await asyncio.to_thread(_cached_rates, db, target, needed)
+        if all(c in cached for c in needed):
+            quotes = {c: rate for c, (rate, _) in cached.items()}
+            rate_date = max(d for _, d in cached.values())
+        else:
+            try:
+                quotes, rate_date = await _refresh_base_async(target, needed)
+            except Exception:
+                fallback = await asyncio.to_thread(_stale_quotes, db, target, needed)
+                if fallback is None:
+                    raise
+                (quotes, rate_date), stale = fallback, True
+
+    return _invert(quotes, needed), rate_date, stale
+
+
+def refresh_stale_bases(seen: dict[str, datetime] | None = None) -> None:
+    """Refetch every supported base whose newest rates are older than RATE_REFRESH_AGE.
+
+    Bases another worker refreshed since `seen` are loaded into this worker's
+    in-process cache instead of being fetched again.
     """
-    rates: dict[str, float] = {}
-    rate_date: date_type | None = None
+    seen = seen if seen is not None else {}
+    db = SessionLocal()
+    try:
+        latest = dict(
+            db.query(ExchangeRate.base_currency, func.max(ExchangeRate.fetched_at))
+            .filter(ExchangeRate.base_currency.in_(SUPPORTED_CURRENCIES))
+            .group_by(ExchangeRate.base_currency)
+            .all()
+        )
+        refresh_before = datetime.utcnow() - RATE_REFRESH_AGE
+        for base in SUPPORTED_CURRENCIES:
+            targets = [c for c in SUPPORTED_CURRENCIES if c != base]
+            fetched_at = latest.get(base)
+            if fetched_at is None or fetched_at < refresh_before:
+                try:
+                    _refresh_base(db, base)
+                except ExchangeRateUnavailable:
+                    break  # circuit open: leave upstream alone until the next cycle
+                except Exception:
+                    db.rollback()  # already logged; keep serving what we have
+            elif seen.get(base) != fetched_at:
+                for target, (rate, rate_date) in _last_known_rates(db, base, targets).items():
+                    rate_cache.put(base, target, rate, rate_date, fetched_at)
+                seen[base] = fetched_at
+    finally:
+        db.close()
+
+
+async def run_rate_refresher(interval: float = EXCHANGE_REFRESH_INTERVAL) -> None:
+    """Pre-warm, then keep refreshing, rates for all supported bases until cancelled."""
+    seen: dict[str, datetime] = {}
+    while True:
+        try:
+            await asyncio.to_thread(refresh_stale_bases, seen)
+        except Exception:
+            logger.error("Exchange rate refresh failed", exc_info=True)
+        await asyncio.sleep(interval)
 
-    for currency in currencies:
-        if currency == target:
-            continue
-        rate, d = get_rate(db, currency, target)
-        rates[currency] = rate
-        rate_date = d
 
-    return rates, rate_date
+def start_rate_refresher() -> asyncio.Task | None:
+    """Start the background refresher unless EXCHANGE_REFRESH_INTERVAL is 0."""
+    if EXCHANGE_REFRESH_INTERVAL <= 0:
+        return None
+    return asyncio.create_task(run_rate_refresher())
@@ -0,0 +1,74 @@
+"""Shared outbound HTTP clients with keep-alive connection pooling.
+
+Module-level httpx.get() opens a fresh TCP+TLS connection per call; these
+clients keep connections to each upstream open between requests. The async
+client is opened and closed by the app lifespan, the sync one is created
+on first use (background threads, CLI) and closed on shutdown.
+"""
+
+import asyncio
+import importlib.util
+import threading
+
+import httpx
+
+TIMEOUT = httpx.Timeout(connect=3.0, read=10.0, write=10.0, pool=5.0)
+LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=10, keepalive_expiry=30.0)
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+_sync_client: httpx.Client | None = None
+_sync_lock = threading.Lock()
+_async_client: httpx.AsyncClient | None = None
+_async_loop: asyncio.AbstractEventLoop | None = None
+_closing: set[asyncio.Task] = set()  # aclose() tasks for retired clients
+
+
+def get_client() -> httpx.Client:
+    """Return the process-wide pooled sync client."""
+    global _sync_client
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(timeout=TIMEOUT, limits=LIMITS, http2=HTTP2)
+    return _sync_client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the pooled async client bound to the running event loop."""
+    global _async_client, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_loop is not loop:
+        # Pooled connections belong to the loop that opened them
+        if _async_client is not None:
+            _retire_async_client(_async_client, _async_loop)
+        _async_client = httpx.AsyncClient(timeout=TIMEOUT, limits=LIMITS, http2=HTTP2)
+        _async_loop = loop
+    return _async_client
+
+
+def _retire_async_client(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+    """Close a client left behind by another event loop."""
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        return
+    # Its loop has stopped; closing from this one just drops the sockets
+    task = asyncio.get_running_loop().create_task(client.aclose())
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+async def open_clients() -> None:
+    get_async_client()
+
+
+async def close_clients() -> None:
+    global _sync_client, _async_client, _async_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = _async_loop = None
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
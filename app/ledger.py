@@ -0,0 +1,206 @@
+"""Materialized per-trip balance ledger.
+
+`trip_balances` holds one row per (trip, currency, member) with the running
+net balance, so the balances endpoint reads O(members) rows instead of
+replaying every expense through compute_net_balances(). Write routes apply
+the delta of each expense/settlement in the same transaction as the change.
+
+Each row also counts the expense/settlement legs touching it; a row is
+dropped when that count reaches zero, which keeps the key set identical to
+what compute_net_balances() would produce (including zero balances).
+
+Run `python -m app.ledger verify` to compare the ledger against a full
+recompute, or `python -m app.ledger rebuild` to regenerate it.
+"""
+
+import argparse
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.balances import calculate_split, compute_net_balances
+from app.models import Trip, TripBalance
+from app.serializers import serialize_expense, serialize_settlement
+
+_UPSERT_INSERT = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _expense_entries(expense: dict, trip_currency: str) -> list[tuple[str, str, int]]:
+    """Return (currency, member_id, amount) legs for a serialized expense."""
+    currency = expense.get("currency") or trip_currency
+    splits = calculate_split(
+        expense["amount"],
+        expense["splitMethod"],
+        expense["involvedMembers"],
+        expense["splitDetails"],
+    )
+    entries = [(currency, expense["paidBy"], expense["amount"])]
+    entries.extend((currency, member_id, -share) for member_id, share in splits.items())
+    return entries
+
+
+def _settlement_entries(settlement: dict, trip_currency: str) -> list[tuple[str, str, int]]:
+    """Return (currency, member_id, amount) legs for a serialized settlement."""
+    currency = settlement.get("currency") or trip_currency
+    return [
+        (currency, settlement["from"], settlement["amount"]),
+        (currency, settlement["to"], -settlement["amount"]),
+    ]
+
+
+def _apply(db: Session, trip_id: int, entries: list[tuple[str, str, int]], sign: int) -> None:
+    deltas: dict[tuple[str, int], list[int]] = {}
+    for currency, member_id, amount in entries:
+        delta = deltas.setdefault((currency, int(member_id)), [0, 0])
+        delta[0] += sign * amount
+        delta[1] += sign
+    if not deltas:
+        return
+
+    rows = [
+        {"trip_id": trip_id, "currency": currency, "member_id": member_id, "balance": balance, "entry_count": count}
+        for (currency, member_id), (balance, count) in deltas.items()
+    ]
+    insert = _UPSERT_INSERT.get(db.get_bind().dialect.name)
+    if insert is not None:
+        # One upsert adds to existing rows, so concurrent first writes to the
+        # same (trip, currency, member) can't both insert
+        stmt = insert(TripBalance).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[TripBalance.trip_id, TripBalance.currency, TripBalance.member_id],
+            set_={
+                TripBalance.balance: TripBalance.balance + stmt.excluded.balance,
+                TripBalance.entry_count: TripBalance.entry_count + stmt.excluded.entry_count,
+            },
+        ))
+    else:
+        for row in rows:
+            _update_or_insert(db, row)
+
+    db.flush()
+    db.query(TripBalance).filter(
+        TripBalance.trip_id == trip_id, TripBalance.entry_count <= 0
+    ).delete(synchronize_session=False)
+
+
+def _add_to_row(db: Session, row: dict) -> int:
+    # Relative UPDATE so concurrent writers to the same trip don't lose deltas
+    return db.query(TripBalance).filter(
+        TripBalance.trip_id == row["trip_id"],
+        TripBalance.currency == row["currency"],
+        TripBalance.member_id == row["member_id"],
+    ).update(
+        {
+            TripBalance.balance: TripBalance.balance + row["balance"],
+            TripBalance.entry_count: TripBalance.entry_count + row["entry_count"],
+        },
+        synchronize_session=False,
+    )
+
+
+def _update_or_insert(db: Session, row: dict) -> None:
+    """Fallback for dialects without ON CONFLICT."""
+    if _add_to_row(db, row):
+        return
+    try:
+        with db.begin_nested():
+            db.add(TripBalance(**row))
+    except IntegrityError:
+        # Another transaction inserted the row first; add to it instead
+        _add_to_row(db, row)
+
+
+def record_expense(db: Session, trip: Trip, expense: dict) -> None:
+    """Add a serialized expense to the trip's ledger."""
+    _apply(db, trip.id, _expense_entries(expense, trip.currency), 1)
+
+
+def revert_expense(db: Session, trip: Trip, expense: dict) -> None:
+    """Remove a serialized expense from the trip's ledger."""
+    _apply(db, trip.id, _expense_entries(expense, trip.currency), -1)
+
+
+def record_settlement(db: Session, trip: Trip, settlement: dict) -> None:
+    """Add a serialized settlement to the trip's ledger."""
+    _apply(db, trip.id, _settlement_entries(settlement, trip.currency), 1)
+
+
+def revert_settlement(db: Session, trip: Trip, settlement: dict) -> None:
+    """Remove a serialized settlement from the trip's ledger."""
+    _apply(db, trip.id, _settlement_entries(settlement, trip.currency), -1)
+
+
+def load_net_balances(db: Session, trip_id: int) -> dict[str, dict[str, int]]:
+    """Read {currency: {memberId: balance}} from the ledger."""
+    rows = (
+        db.query(TripBalance.currency, TripBalance.member_id, TripBalance.balance)
+        .filter(TripBalance.trip_id == trip_id)
+        .order_by(TripBalance.id)
+        .all()
+    )
+    balances: dict[str, dict[str, int]] = {}
+    for currency, member_id, balance in rows:
+        balances.setdefault(currency, {})[str(member_id)] = balance
+    return balances
+
+
+def recompute_net_balances(trip: Trip) -> dict[str, dict[str, int]]:
+    """Compute balances from scratch by replaying every expense and settlement."""
+    return compute_net_balances(
+        [serialize_expense(e) for e in trip.expenses],
+        [serialize_settlement(s) for s in trip.settlements],
+        trip.currency,
+    )
+
+
+def rebuild_trip_balances(db: Session, trip: Trip) -> None:
+    """Discard and regenerate the ledger rows for a trip."""
+    db.query(TripBalance).filter(TripBalance.trip_id == trip.id).delete(synchronize_session=False)
+    entries: list[tuple[str, str, int]] = []
+    for expense in trip.expenses:
+        entries.extend(_expense_entries(serialize_expense(expense), trip.currency))
+    for settlement in trip.settlements:
+        entries.extend(_settlement_entries(serialize_settlement(settlement), trip.currency))
+    _apply(db, trip.id, entries, 1)
+
+
+def verify_trip_balances(db: Session, trip: Trip) -> bool:
+    """Return True if the ledger matches a full recompute for this trip."""
+    return load_net_balances(db, trip.id) == recompute_net_balances(trip)
+
+
+def main(argv: list[str] | None = None) -> int:
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.ledger", description="Verify or rebuild trip_balances")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--trip-id", type=int, action="append", help="Limit to these trip ids")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    mismatched = 0
+    try:
+        query = db.query(Trip.id).order_by(Trip.id)
+        if args.trip_id:
+            query = query.filter(Trip.id.in_(args.trip_id))
+        trip_ids = [row.id for row in query.all()]
+        for trip_id in trip_ids:
+            trip = db.get(Trip, trip_id)
+            if args.command == "rebuild":
+                rebuild_trip_balances(db, trip)
+                db.commit()
+            elif not verify_trip_balances(db, trip):
+                mismatched += 1
+                print(f"trip {trip_id}: ledger does not match recompute")
+            db.expunge_all()
+    finally:
+        db.close()
+
+    if args.command == "verify":
+        print(f"{mismatched} trip(s) with mismatched balances")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
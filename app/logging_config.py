@@ -1,25 +1,137 @@
+"""JSON logging for the "yoyo" logger.
+
+Records are put on a bounded queue and a background thread formats and
+writes them, so a slow stdout never blocks a request. When the queue is
+full, records are dropped and counted (yoyo_log_records_dropped_total), and
+the writer logs how many went missing once it catches up. LOG_ASYNC=false
+restores the plain synchronous handler.
+
+Request log sampling is configured here as well. LOG_SAMPLE_RATES maps
+route templates to the fraction of successful requests to log, e.g.
+"/me=0.1,/trips/{access_token}=0.25". Errors and requests slower than
+LOG_SLOW_MS are always logged.
+"""
+
+import importlib.util
 import json
 import logging
-from datetime import datetime
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+from app.metrics import LOG_RECORDS_DROPPED
+
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() != "false"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SLOW_MS = float(os.getenv("LOG_SLOW_MS", "1000"))
+LOG_SAMPLE_RATES = {
+    route.strip(): float(rate)
+    for route, _, rate in (entry.rpartition("=") for entry in os.getenv("LOG_SAMPLE_RATES", "").split(",") if entry.strip())
+}
+
+# orjson is optional (pip install "yoyo-server[fast-json]"); same output, ~5x faster
+if importlib.util.find_spec("orjson") is not None:
+    import orjson
+
+    def _dumps(obj: dict) -> str:
+        return orjson.dumps(obj, default=str).decode()
+else:
+    def _dumps(obj: dict) -> str:
+        return json.dumps(obj, default=str)
+
+
+def request_sample_rate(route: str) -> float:
+    """Fraction of successful, fast requests to `route` that get logged."""
+    return LOG_SAMPLE_RATES.get(route, 1.0)
 
 
 class JSONFormatter(logging.Formatter):
     def format(self, record):
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            # From the record, so queued records keep the time they were logged
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
         if hasattr(record, "extra_data"):
             log_entry.update(record.extra_data)
-        if record.exc_info and record.exc_info[0]:
-            log_entry["exception"] = self.formatException(record.exc_info)
-        return json.dumps(log_entry)
+        if record.exc_info and record.exc_info[0] and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            log_entry["exception"] = record.exc_text
+        return _dumps(log_entry)
+
+
+class AsyncLogHandler(logging.Handler):
+    """Hands records to a writer thread through a bounded queue."""
+
+    BATCH_SIZE = 512
+
+    def __init__(self, stream=None, max_queue: int = LOG_QUEUE_SIZE):
+        super().__init__()
+        self.stream = stream or sys.stderr
+        self.queue: queue.Queue[logging.LogRecord | None] = queue.Queue(max_queue)
+        self.dropped = 0
+        self._reported = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.exc_info and record.exc_info[0] and self.formatter:
+            # Render tracebacks now; the frames may be gone by the time the writer runs
+            record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            self._write([record for record in batch if record is not None])
+            if stop:
+                return
+
+    def _write(self, records: list[logging.LogRecord]) -> None:
+        if self.dropped > self._reported:
+            missed, self._reported = self.dropped - self._reported, self.dropped
+            records.append(logging.LogRecord(
+                "yoyo", logging.WARNING, __file__, 0, "Log records dropped", None, None,
+            ))
+            records[-1].extra_data = {"dropped": missed}
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record) + "\n")
+            except Exception:
+                self.handleError(record)
+        try:
+            self.stream.write("".join(lines))
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
+
+    def close(self) -> None:
+        """Write out everything still queued, then stop the writer."""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout=5)
+        super().close()
 
 
 def setup_logging():
-    handler = logging.StreamHandler()
+    handler = AsyncLogHandler() if LOG_ASYNC else logging.StreamHandler()
     handler.setFormatter(JSONFormatter())
 
     root_logger = logging.getLogger("yoyo")
@@ -1,17 +1,25 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager, suppress
 
 import sentry_sdk
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
 from app.database import engine, Base
+from app.exchange import start_rate_refresher
+from app.http_client import close_clients, open_clients
 from app.logging_config import setup_logging
+from app.metrics import RATE_LIMIT_REJECTIONS, instrument_pool, mark_worker_exited, route_label, start_metrics_sampler
 from app.middleware import CTKMiddleware, RequestLoggingMiddleware
+from app.profiling import PROFILING_ENABLED, ProfilingMiddleware, start_continuous_profiler, stop_continuous_profiler
 from app.ratelimit import limiter
-from app.routes import trips, members, expenses, settlements, exchange, users, balances, receipts
+from app.receipt.jobs import start_scan_worker
+from app.routes import trips, members, expenses, settlements, exchange, users, balances, receipts, metrics, profiles
+from app.slow_queries import install_slow_query_log
 
 load_dotenv()
 
@@ -35,9 +43,37 @@ if sentry_dsn:
 
 logger = setup_logging()
 
-app = FastAPI(title="Yoyo API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_clients()
+    # Keep exchange rates warm so balance requests never wait on the upstream API
+    refresher = start_rate_refresher()
+    scan_worker = start_scan_worker()
+    sampler = start_metrics_sampler()
+    profiler = start_continuous_profiler()
+    yield
+    if profiler:
+        stop_continuous_profiler(profiler)
+    for task in (sampler, scan_worker, refresher):
+        if task:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await close_clients()
+    mark_worker_exited()
+
+
+app = FastAPI(title="Yoyo API", version="0.1.0", lifespan=lifespan)
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+
+def _rate_limited(request: Request, exc: RateLimitExceeded):
+    RATE_LIMIT_REJECTIONS.labels(route_label(request.scope)).inc()
+    return _rate_limit_exceeded_handler(request, exc)
+
+
+app.add_exception_handler(RateLimitExceeded, _rate_limited)
 
 # CORS
 origins = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
@@ -46,13 +82,19 @@ app.add_middleware(
     allow_origins=[o.strip() for o in origins],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
-    allow_headers=["Content-Type"],
+    allow_headers=["Content-Type", "If-None-Match"],
+    expose_headers=["ETag"],
 )
 app.add_middleware(RequestLoggingMiddleware)
 app.add_middleware(CTKMiddleware)
+# Profiling is wired up only when enabled, so it costs nothing otherwise
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
 
 # Create tables (use Alembic in production)
 Base.metadata.create_all(bind=engine)
+instrument_pool(engine.pool)
+install_slow_query_log(engine)
 
 # Routes
 app.include_router(trips.router, prefix="/api")
@@ -63,6 +105,9 @@ app.include_router(exchange.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(balances.router, prefix="/api")
 app.include_router(receipts.router, prefix="/api")
+app.include_router(metrics.router)
+if PROFILING_ENABLED:
+    app.include_router(profiles.router)
 
 
 @app.get("/health")
@@ -0,0 +1,195 @@
+"""Prometheus metrics shared across the app.
+
+Under several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by the workers (and wiped before each start). Every worker
+then writes its samples there and GET /metrics aggregates all of them.
+Gauges use the "live" modes, so a worker's values go away once it exits.
+"""
+
+import asyncio
+import os
+import time
+
+import anyio.to_thread
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import Pool, QueuePool
+from starlette.types import Scope
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+METRICS_SAMPLE_INTERVAL = float(os.getenv("METRICS_SAMPLE_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+BYTES_BUCKETS = tuple(2 ** n * 16 * 1024 for n in range(11))  # 16 KB .. 16 MB
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+RECEIPT_SCAN_SECONDS = Histogram(
+    "yoyo_receipt_scan_seconds",
+    "Receipt extraction time including cache and preprocessing",
+    ["provider", "language", "outcome"],
+    buckets=SECONDS_BUCKETS,
+)
+RECEIPT_PROVIDER_SECONDS = Histogram(
+    "yoyo_receipt_provider_seconds",
+    "Time spent waiting on the receipt provider",
+    ["provider", "language"],
+    buckets=SECONDS_BUCKETS,
+)
+RECEIPT_UPLOAD_BYTES = Histogram(
+    "yoyo_receipt_upload_bytes",
+    "Size of uploaded receipt images",
+    ["provider"],
+    buckets=BYTES_BUCKETS,
+)
+RECEIPT_ENCODED_BYTES = Histogram(
+    "yoyo_receipt_encoded_bytes",
+    "Size of the image payload sent to the provider",
+    ["provider"],
+    buckets=BYTES_BUCKETS,
+)
+RECEIPT_TOKENS = Histogram(
+    "yoyo_receipt_tokens",
+    "Model tokens used per receipt scan",
+    ["provider", "kind"],
+    buckets=TOKEN_BUCKETS,
+)
+RECEIPT_CACHE_LOOKUPS = Counter(
+    "yoyo_receipt_cache_lookups",
+    "Receipt result cache lookups",
+    ["result"],
+)
+RECEIPT_SCAN_ERRORS = Counter(
+    "yoyo_receipt_scan_errors",
+    "Failed receipt extractions",
+    ["provider", "error_class"],
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "yoyo_http_request_seconds",
+    "Request latency by route template and status",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "yoyo_rate_limit_rejections",
+    "Requests rejected by the rate limiter",
+    ["route"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "yoyo_db_pool_checked_out",
+    "Database connections currently checked out",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "yoyo_db_pool_overflow",
+    "Connections open beyond the pool size",
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "yoyo_db_pool_wait_seconds",
+    "Time spent waiting to check out a database connection",
+    buckets=WAIT_BUCKETS,
+)
+THREADPOOL_BUSY = Gauge(
+    "yoyo_threadpool_busy_threads",
+    "Worker threads running sync routes and offloaded calls",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_LIMIT = Gauge(
+    "yoyo_threadpool_limit",
+    "Maximum worker threads",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_WAITING = Gauge(
+    "yoyo_threadpool_waiting_tasks",
+    "Calls queued for a free worker thread",
+    multiprocess_mode="livesum",
+)
+EXCHANGE_RATE_LOOKUPS = Counter(
+    "yoyo_exchange_rate_lookups",
+    "Exchange rate lookups by where they were answered (memory, table, miss)",
+    ["source"],
+)
+EXCHANGE_RATE_FETCH_SECONDS = Histogram(
+    "yoyo_exchange_rate_fetch_seconds",
+    "Upstream exchange rate API latency",
+    ["outcome"],
+    buckets=SECONDS_BUCKETS,
+)
+LOG_RECORDS_DROPPED = Counter(
+    "yoyo_log_records_dropped",
+    "Log records dropped because the log queue was full",
+)
+
+
+def route_label(scope: Scope) -> str:
+    """The matched route template, so label values stay bounded."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def instrument_pool(pool: Pool) -> None:
+    """Track checked-out connections, overflow and checkout wait time."""
+    if not isinstance(pool, QueuePool):
+        return
+
+    def update(returning: int) -> None:
+        DB_POOL_CHECKED_OUT.set(pool.checkedout() - returning)
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    # "checkin" fires before the connection is back in the queue
+    event.listen(pool, "checkout", lambda *_: update(0))
+    event.listen(pool, "checkin", lambda *_: update(1))
+
+    # The pool has no "before checkout" event, so time the internal getter
+    do_get = pool._do_get
+
+    def timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+    pool._do_get = timed_do_get
+
+
+def sample_threadpool() -> None:
+    """Record anyio's worker thread usage; must run on the event loop."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    stats = limiter.statistics()
+    THREADPOOL_BUSY.set(stats.borrowed_tokens)
+    THREADPOOL_LIMIT.set(stats.total_tokens)
+    THREADPOOL_WAITING.set(stats.tasks_waiting)
+
+
+async def run_metrics_sampler(interval: float = METRICS_SAMPLE_INTERVAL) -> None:
+    """Refresh the sampled gauges until cancelled."""
+    while True:
+        sample_threadpool()
+        await asyncio.sleep(interval)
+
+
+def start_metrics_sampler() -> asyncio.Task | None:
+    """Start the gauge sampler unless METRICS_SAMPLE_INTERVAL is 0."""
+    if METRICS_SAMPLE_INTERVAL <= 0:
+        return None
+    return asyncio.create_task(run_metrics_sampler())
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Encode every metric, aggregated across workers in multiprocess mode."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_exited() -> None:
+    """Drop this worker's live gauges from the shared directory."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
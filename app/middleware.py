@@ -1,30 +1,60 @@
 import logging
+import random
 import secrets
 import time
 
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.requests import Request
 from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from app.database import SessionLocal
-from app.models import User
+from app.logging_config import LOG_SLOW_MS, request_sample_rate
+from app.metrics import HTTP_REQUEST_SECONDS, route_label
+from app.timing import SERVER_TIMING_ENABLED, track_request
 
 logger = logging.getLogger("yoyo")
 
 CTK_COOKIE_NAME = "ctk"
 CTK_MAX_AGE = 315360000  # 10 years
 
-SKIP_LOG_PATHS = {"/health", "/docs", "/openapi.json", "/redoc"}
+SKIP_LOG_PATHS = {"/health", "/metrics", "/docs", "/openapi.json", "/redoc"}
 
+# Both middlewares are plain ASGI rather than BaseHTTPMiddleware, which runs
+# the rest of the stack in a separate task and re-wraps every response body.
 
-class CTKMiddleware(BaseHTTPMiddleware):
-    """Assigns a cookie tracking key (ctk) to every visitor and resolves User."""
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+def _ctk_cookie(ctk: str, is_local: bool) -> str:
+    """Render the Set-Cookie value exactly as Response.set_cookie would."""
+    response = Response()
+    response.set_cookie(
+        key=CTK_COOKIE_NAME,
+        value=ctk,
+        max_age=CTK_MAX_AGE,
+        httponly=True,
+        samesite="lax",
+        secure=not is_local,
+        path="/api",
+        domain=".getyoyo.co" if not is_local else None,
+    )
+    return response.headers["set-cookie"]
+
+
+class CTKMiddleware:
+    """Assigns a cookie tracking key (ctk) to every visitor.
+
+    The user behind the ctk is resolved lazily by deps.get_current_user.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # Skip CTK processing for CORS preflight requests
-        if request.method == "OPTIONS":
-            return await call_next(request)
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
 
+        request = Request(scope)
         ctk = request.cookies.get(CTK_COOKIE_NAME)
         new_ctk = False
 
@@ -32,55 +62,83 @@ class CTKMiddleware(BaseHTTPMiddleware):
             ctk = secrets.token_urlsafe(24)
             new_ctk = True
 
-        # Make CTK and resolved user available to route handlers
+        # Make CTK available to route handlers
         request.state.ctk = ctk
-        request.state.user = None
         if not new_ctk:
-            db = SessionLocal()
-            try:
-                request.state.user = db.query(User).filter(User.ctk == ctk).first()
-            finally:
-                db.close()
-
-        response: Response = await call_next(request)
-
-        if new_ctk:
-            is_local = request.url.hostname in ("localhost", "127.0.0.1")
-            response.set_cookie(
-                key=CTK_COOKIE_NAME,
-                value=ctk,
-                max_age=CTK_MAX_AGE,
-                httponly=True,
-                samesite="lax",
-                secure=not is_local,
-                path="/api",
-                domain=".getyoyo.co" if not is_local else None,
-            )
-
-        return response
-
-
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Logs method, path, status code, duration, and ctk for each request."""
-
-    async def dispatch(self, request: Request, call_next) -> Response:
-        start = time.time()
-        response = await call_next(request)
-        duration_ms = round((time.time() - start) * 1000)
-
-        path = request.url.path
-        if path in SKIP_LOG_PATHS:
-            return response
-
-        ctk = getattr(request.state, "ctk", None)
-        logger.info(
-            f"{request.method} {path} {response.status_code}",
-            extra={"extra_data": {
-                "method": request.method,
+            await self.app(scope, receive, send)
+            return
+
+        cookie = _ctk_cookie(ctk, request.url.hostname in ("localhost", "127.0.0.1"))
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("set-cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+class RequestLoggingMiddleware:
+    """Logs method, path, status code, duration, DB usage and ctk for each request.
+
+    Successful, fast requests are sampled per route (LOG_SAMPLE_RATES).
+
+    With SERVER_TIMING_ENABLED, the same numbers are sent back in a
+    Server-Timing header, broken out by phase.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in SKIP_LOG_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        logged = False
+
+        def log() -> None:
+            nonlocal logged
+            logged = True
+            elapsed = time.perf_counter() - start
+            duration_ms = round(elapsed * 1000)
+            method, path, route = scope["method"], scope["path"], route_label(scope)
+            HTTP_REQUEST_SECONDS.labels(method, route, status_code).observe(elapsed)
+            extra_data = {
+                "method": method,
                 "path": path,
-                "status": response.status_code,
+                "status": status_code,
                 "duration_ms": duration_ms,
-                "ctk": ctk,
-            }},
-        )
-        return response
+                "db_queries": timing.queries,
+                "db_ms": round(timing.db_ms, 1),
+                "ctk": scope.get("state", {}).get("ctk"),
+            }
+            # Errors and slow requests are always logged; the rest may be sampled
+            if status_code < 400 and duration_ms < LOG_SLOW_MS:
+                rate = request_sample_rate(route)
+                if rate < 1:
+                    if random.random() >= rate:
+                        return
+                    extra_data["sample_rate"] = rate
+            logger.info(f"{method} {path} {status_code}", extra={"extra_data": extra_data})
+
+        async def send_and_log(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    total_ms = (time.perf_counter() - start) * 1000
+                    MutableHeaders(scope=message).append("server-timing", timing.server_timing(total_ms))
+            await send(message)
+            # Log once the body is out, before any background tasks run
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not logged:
+                log()
+
+        with track_request(scope) as timing:
+            try:
+                await self.app(scope, receive, send_and_log)
+            finally:
+                if not logged:
+                    log()
@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from sqlalchemy import (
-    Boolean, Column, String, Integer, Numeric, Date, DateTime, ForeignKey, UniqueConstraint,
+    Boolean, Column, String, Integer, Numeric, Date, DateTime, ForeignKey, Index, LargeBinary, Text, UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
 
@@ -33,10 +33,10 @@ class Member(Base):
     __tablename__ = "members"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False)
+    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String(255), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
-    settled_by_id = Column(Integer, ForeignKey("members.id", ondelete="SET NULL"), nullable=True)
+    settled_by_id = Column(Integer, ForeignKey("members.id", ondelete="SET NULL"), nullable=True, index=True)
     settlement_currency = Column(String(3), nullable=True)  # NULL = same as group
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
@@ -47,17 +47,19 @@ class Expense(Base):
     __tablename__ = "expenses"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False)
+    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False, index=True)
     description = Column(String(500), nullable=False)
     amount = Column(Integer, nullable=False)
-    paid_by_id = Column(Integer, ForeignKey("members.id", ondelete="RESTRICT"), nullable=False)
+    paid_by_id = Column(Integer, ForeignKey("members.id", ondelete="RESTRICT"), nullable=False, index=True)
     date = Column(Date, nullable=False)
     split_method = Column(String(20), nullable=False)
     currency = Column(String(3), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     trip = relationship("Trip", back_populates="expenses")
-    involved_members = relationship("ExpenseMember", back_populates="expense", cascade="all, delete-orphan")
+    involved_members = relationship(
+        "ExpenseMember", back_populates="expense", cascade="all, delete-orphan", order_by="ExpenseMember.id",
+    )
 
 
 class ExpenseMember(Base):
@@ -65,7 +67,7 @@ class ExpenseMember(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     expense_id = Column(Integer, ForeignKey("expenses.id", ondelete="CASCADE"), nullable=False)
-    member_id = Column(Integer, ForeignKey("members.id", ondelete="RESTRICT"), nullable=False)
+    member_id = Column(Integer, ForeignKey("members.id", ondelete="RESTRICT"), nullable=False, index=True)
     split_value = Column(Numeric, nullable=True)
 
     __table_args__ = (UniqueConstraint("expense_id", "member_id"),)
@@ -77,9 +79,9 @@ class Settlement(Base):
     __tablename__ = "settlements"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False)
-    from_member_id = Column(Integer, ForeignKey("members.id", ondelete="RESTRICT"), nullable=False)
-    to_member_id = Column(Integer, ForeignKey("members.id", ondelete="RESTRICT"), nullable=False)
+    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False, index=True)
+    from_member_id = Column(Integer, ForeignKey("members.id", ondelete="RESTRICT"), nullable=False, index=True)
+    to_member_id = Column(Integer, ForeignKey("members.id", ondelete="RESTRICT"), nullable=False, index=True)
     amount = Column(Integer, nullable=False)
     date = Column(Date, nullable=False)
     currency = Column(String(3), nullable=True)
@@ -88,6 +90,21 @@ class Settlement(Base):
     trip = relationship("Trip", back_populates="settlements")
 
 
+class TripBalance(Base):
+    """Materialized net balance per (trip, currency, member), maintained by app.ledger."""
+
+    __tablename__ = "trip_balances"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False)
+    currency = Column(String(3), nullable=False)
+    member_id = Column(Integer, ForeignKey("members.id", ondelete="CASCADE"), nullable=False)
+    balance = Column(Integer, nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)  # expense/settlement legs touching this row
+
+    __table_args__ = (UniqueConstraint("trip_id", "currency", "member_id"),)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -106,7 +123,10 @@ class UserTrip(Base):
     trip_id = Column(Integer, ForeignKey("trips.id", ondelete="CASCADE"), nullable=False)
     last_visited_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-    __table_args__ = (UniqueConstraint("user_id", "trip_id"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "trip_id"),
+        Index("ix_user_trips_user_id_last_visited_at", "user_id", "last_visited_at"),
+    )
 
 
 class ExchangeRate(Base):
@@ -119,4 +139,43 @@ class ExchangeRate(Base):
     rate = Column(Numeric(18, 8), nullable=False)
     fetched_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-    __table_args__ = (UniqueConstraint("date", "base_currency", "target_currency"),)
+    __table_args__ = (
+        UniqueConstraint("date", "base_currency", "target_currency"),
+        Index("ix_exchange_rates_pair_fetched_at", "base_currency", "target_currency", "fetched_at"),
+    )
+
+
+class ReceiptScanCache(Base):
+    """Extraction results keyed by image content hash, see app.receipt.cache."""
+
+    __tablename__ = "receipt_scan_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)
+    result = Column(Text, nullable=False)  # ReceiptExtractionResult as JSON
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class ReceiptScanJob(Base):
+    """Queued receipt scans run by the worker in app.receipt.jobs."""
+
+    __tablename__ = "receipt_scan_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    token = Column(String(32), unique=True, nullable=False, index=True)
+    trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False, index=True)
+    status = Column(String(10), nullable=False, default="queued")  # queued, running, done, failed
+    image = Column(LargeBinary, nullable=True)  # cleared once the job finishes
+    content_type = Column(String(50), nullable=False)
+    language = Column(String(35), nullable=False)
+    fallback_currency = Column(String(3), nullable=False)
+    result = Column(Text, nullable=True)  # ReceiptExtractionResult as JSON
+    error = Column(String(255), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_receipt_scan_jobs_status_created_at", "status", "created_at"),
+    )
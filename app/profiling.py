@@ -0,0 +1,204 @@
+"""Opt-in sampling profiler for production requests.
+
+Nothing here is installed unless PROFILING_ENABLED=true. Then:
+
+- A request carrying `X-Profile-Token: <PROFILE_TOKEN>` is sampled every
+  PROFILE_INTERVAL_MS until the app returns. The profile is written to
+  PROFILE_DIR and its name comes back in an `X-Profile-Id` header.
+- PROFILE_CONTINUOUS_HZ > 0 also runs a low-rate sampler for the life of
+  the worker. It aggregates hot stacks across all requests into
+  continuous-<pid>.folded, rewritten every PROFILE_FLUSH_SECONDS.
+
+Profiles use the "folded" format (one `frame;frame;frame count` line per
+stack), which flamegraph.pl and speedscope read directly. Samples come from
+sys._current_frames(), so the event loop and threadpool threads are both
+covered. Threads parked in the selector or a work queue are skipped.
+Requests running concurrently on the same worker also show up.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger("yoyo")
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/tmp/yoyo-profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_CONTINUOUS_HZ = float(os.getenv("PROFILE_CONTINUOUS_HZ", "0"))
+PROFILE_FLUSH_SECONDS = float(os.getenv("PROFILE_FLUSH_SECONDS", "60"))
+PROFILE_MAX_STACKS = int(os.getenv("PROFILE_MAX_STACKS", "20000"))
+
+# A leaf frame in one of these means the thread is waiting for work
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+_PROFILE_ID = re.compile(r"[\w.-]+\.folded")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    elif os.sep + "app" + os.sep in filename:
+        filename = "app" + os.sep + filename.rsplit(os.sep + "app" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_qualname} ({filename}:{frame.f_lineno})".replace(";", ":")
+
+
+def _sample(stacks: Counter, skip: set[int]) -> None:
+    """Add one sample of every busy thread's stack to `stacks`."""
+    names = {t.ident: t.name for t in threading.enumerate()}
+    for ident, frame in sys._current_frames().items():
+        if ident in skip or frame.f_code.co_filename.endswith(_IDLE_FILES):
+            continue
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.append(names.get(ident, str(ident)))
+        stack = ";".join(reversed(labels))
+        if stack in stacks or len(stacks) < PROFILE_MAX_STACKS:
+            stacks[stack] += 1
+
+
+def _write(name: str, stacks: Counter) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / name
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+    tmp.replace(path)
+    return path
+
+
+class Sampler(threading.Thread):
+    """Samples every thread's stack at a fixed interval until stopped."""
+
+    def __init__(self, interval: float, skip: set[int] | None = None):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.skip = skip or set()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        self.skip.add(threading.get_ident())
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                _sample(self.stacks, self.skip)
+                self.samples += 1
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.stacks)
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to `timeout`; True once the sampler has been stopped."""
+        return self._stop_event.wait(timeout)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def profile_authorized(scope: Scope) -> bool:
+    """True if the request carries the profiling token."""
+    if not PROFILE_TOKEN:
+        return False
+    for key, value in scope["headers"]:
+        if key == b"x-profile-token":
+            return secrets.compare_digest(value, PROFILE_TOKEN.encode())
+    return False
+
+
+class ProfilingMiddleware:
+    """Profiles requests that present X-Profile-Token; only added when enabled."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith("/debug/profiles/") or not profile_authorized(scope):
+            await self.app(scope, receive, send)
+            return
+
+        slug = re.sub(r"[^\w-]+", "_", scope["path"]).strip("_")[:80]
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{scope['method']}-{slug}.folded"
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("x-profile-id", profile_id)
+            await send(message)
+
+        sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            path = await asyncio.to_thread(_write, profile_id, sampler.stacks)
+            logger.info(
+                "Request profiled",
+                extra={"extra_data": {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "samples": sampler.samples,
+                    "duration_ms": round((time.perf_counter() - start) * 1000),
+                    "profile": str(path),
+                }},
+            )
+
+
+def read_profile(profile_id: str) -> str | None:
+    """Return a stored profile's contents, or None if there is no such profile."""
+    if not _PROFILE_ID.fullmatch(profile_id):
+        return None
+    path = PROFILE_DIR / profile_id
+    return path.read_text() if path.is_file() else None
+
+
+def _continuous_name() -> str:
+    return f"continuous-{os.getpid()}.folded"
+
+
+def _run_continuous(sampler: Sampler) -> None:
+    while not sampler.wait(PROFILE_FLUSH_SECONDS):
+        try:
+            _write(_continuous_name(), sampler.snapshot())
+        except OSError:
+            logger.error("Continuous profile flush failed", exc_info=True)
+
+
+def start_continuous_profiler() -> Sampler | None:
+    """Start the low-rate background sampler if enabled."""
+    if not PROFILING_ENABLED or PROFILE_CONTINUOUS_HZ <= 0:
+        return None
+    sampler = Sampler(1 / PROFILE_CONTINUOUS_HZ)
+    flusher = threading.Thread(target=_run_continuous, args=(sampler,), name="profile-flusher", daemon=True)
+    sampler.start()
+    flusher.start()
+    return sampler
+
+
+def stop_continuous_profiler(sampler: Sampler) -> None:
+    """Stop the background sampler and write out what it collected."""
+    sampler.stop()
+    try:
+        _write(_continuous_name(), sampler.snapshot())
+    except OSError:
+        logger.error("Continuous profile flush failed", exc_info=True)
@@ -0,0 +1,71 @@
+"""Turn a scanned receipt into per-member shares in integer minor units."""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from app.balances import CURRENCY_DECIMALS
+from app.receipt.base import ReceiptExtractionResult
+
+
+def to_minor(amount: float | None, currency: str) -> int:
+    """Display units -> integer minor units (12.5 USD -> 1250, 1200 JPY -> 1200)."""
+    if not amount:
+        return 0
+    exponent = Decimal(10) ** CURRENCY_DECIMALS.get(currency, 2)
+    return int((Decimal(str(amount)) * exponent).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def receipt_total(result: ReceiptExtractionResult, currency: str) -> int:
+    """The amount paid: the printed total, else items plus extras."""
+    if result.total:
+        return to_minor(result.total, currency)
+    items = sum(to_minor(item.amount, currency) for item in result.line_items)
+    extras = sum(to_minor(v, currency) for v in (result.tax, result.tips, result.fees))
+    return items + extras - to_minor(result.discount, currency)
+
+
+def _split_even(amount: int, members: list[str]) -> dict[str, int]:
+    # Same remainder rule as balances.calculate_split("even")
+    base, remainder = divmod(amount, len(members))
+    return {mid: base + (1 if i < remainder else 0) for i, mid in enumerate(members)}
+
+
+def _split_proportional(amount: int, weights: dict[str, int]) -> dict[str, int]:
+    """Largest-remainder allocation, so the parts always add up to amount."""
+    total_weight = sum(weights.values())
+    sign = -1 if amount < 0 else 1
+    quotas = {mid: abs(amount) * w for mid, w in weights.items()}
+    shares = {mid: q // total_weight for mid, q in quotas.items()}
+    leftover = abs(amount) - sum(shares.values())
+    # Ties go to the member listed first, for deterministic results
+    order = sorted(weights, key=lambda mid: -(quotas[mid] % total_weight))
+    for mid in order[:leftover]:
+        shares[mid] += 1
+    return {mid: sign * share for mid, share in shares.items()}
+
+
+def allocate_items(
+    result: ReceiptExtractionResult,
+    currency: str,
+    assignments: dict[int, list[str]],
+    default_members: list[str],
+) -> tuple[int, dict[str, int]]:
+    """Split a receipt by line item and return (total, {member_id: share}).
+
+    Each item is split evenly between the members assigned to it; unassigned
+    items go to default_members. Whatever the items don't cover (tax, tips,
+    fees, minus discount, or any gap to the printed total) is shared in
+    proportion to each member's item subtotal.
+    """
+    total = receipt_total(result, currency)
+    subtotals: dict[str, int] = {}
+    for index, item in enumerate(result.line_items):
+        members = assignments.get(index) or default_members
+        for mid, share in _split_even(to_minor(item.amount, currency), members).items():
+            subtotals[mid] = subtotals.get(mid, 0) + share
+
+    items_total = sum(subtotals.values())
+    if items_total <= 0:
+        return total, _split_even(total, default_members)
+
+    extras = _split_proportional(total - items_total, subtotals)
+    return total, {mid: subtotals[mid] + extras[mid] for mid in subtotals}
@@ -0,0 +1,109 @@
+"""Content-hash result cache around any ReceiptExtractor.
+
+Re-uploads of the same photo (flaky connections, another member scanning
+the same receipt) are answered from the receipt_scan_cache table instead
+of calling the provider again. Entries expire after RECEIPT_CACHE_TTL_DAYS
+and the table is trimmed to the newest RECEIPT_CACHE_MAX_ENTRIES rows.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.models import ReceiptScanCache
+from app.receipt.base import ReceiptExtractionResult, ReceiptExtractor
+from app.receipt.telemetry import current
+
+logger = logging.getLogger("yoyo")
+
+RECEIPT_CACHE_TTL = timedelta(days=int(os.getenv("RECEIPT_CACHE_TTL_DAYS", "30")))
+RECEIPT_CACHE_MAX_ENTRIES = int(os.getenv("RECEIPT_CACHE_MAX_ENTRIES", "10000"))
+
+
+def cache_key(image_bytes: bytes, language: str, fallback_currency: str, provider: str = "") -> str:
+    """SHA-256 over the image digest and every input that changes the result."""
+    image_digest = hashlib.sha256(image_bytes).hexdigest()
+    return hashlib.sha256(f"{provider}|{image_digest}|{language}|{fallback_currency}".encode()).hexdigest()
+
+
+def _load(key: str) -> ReceiptExtractionResult | None:
+    db = SessionLocal()
+    try:
+        row = db.query(ReceiptScanCache).filter(
+            ReceiptScanCache.cache_key == key,
+            ReceiptScanCache.created_at >= datetime.utcnow() - RECEIPT_CACHE_TTL,
+        ).first()
+        return ReceiptExtractionResult.model_validate_json(row.result) if row else None
+    finally:
+        db.close()
+
+
+def _lookup(image_bytes: bytes, language: str, fallback_currency: str, provider: str) -> tuple[str, ReceiptExtractionResult | None]:
+    # Hashing a 10 MB upload takes tens of ms, so it runs off the event loop too
+    key = cache_key(image_bytes, language, fallback_currency, provider)
+    try:
+        return key, _load(key)
+    except Exception as e:
+        # The cache is an optimization; never fail a scan because of it
+        logger.warning(f"Receipt cache lookup failed: {e}")
+        return key, None
+
+
+def _store(key: str, result: ReceiptExtractionResult) -> None:
+    db = SessionLocal()
+    try:
+        db.query(ReceiptScanCache).filter(ReceiptScanCache.cache_key == key).delete()
+        db.add(ReceiptScanCache(cache_key=key, result=result.model_dump_json()))
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent scan of the same image stored it first
+            db.rollback()
+            return
+        _evict(db)
+    finally:
+        db.close()
+
+
+def _evict(db) -> None:
+    """Drop expired rows, then the oldest rows beyond the size cap."""
+    db.query(ReceiptScanCache).filter(
+        ReceiptScanCache.created_at < datetime.utcnow() - RECEIPT_CACHE_TTL
+    ).delete(synchronize_session=False)
+    excess = db.query(ReceiptScanCache).count() - RECEIPT_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = db.query(ReceiptScanCache.id).order_by(ReceiptScanCache.created_at, ReceiptScanCache.id).limit(excess)
+        db.query(ReceiptScanCache).filter(
+            ReceiptScanCache.id.in_(oldest.scalar_subquery())
+        ).delete(synchronize_session=False)
+    db.commit()
+
+
+class CachedReceiptExtractor:
+    """Wraps a provider and memoizes its results by image content hash."""
+
+    def __init__(self, inner: ReceiptExtractor):
+        self.inner = inner
+        self.name = getattr(inner, "name", type(inner).__name__)
+        self.provider = getattr(inner, "provider", type(inner).__name__)
+
+    async def extract(self, image_bytes: bytes, content_type: str, language: str = "en", fallback_currency: str = "USD") -> ReceiptExtractionResult:
+        key, cached = await asyncio.to_thread(_lookup, image_bytes, language, fallback_currency, self.provider)
+        telemetry = current()
+        if telemetry is not None:
+            telemetry.cache_hit = cached is not None
+        if cached is not None:
+            logger.info("Receipt cache hit", extra={"extra_data": {"cache_key": key[:16]}})
+            return cached
+
+        result = await self.inner.extract(image_bytes, content_type, language=language, fallback_currency=fallback_currency)
+        try:
+            await asyncio.to_thread(_store, key, result)
+        except Exception as e:
+            logger.warning(f"Receipt cache store failed: {e}")
+        return result
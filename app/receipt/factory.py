@@ -1,12 +1,39 @@
 import os
+from functools import cache
 
 from app.receipt.base import ReceiptExtractor
+from app.receipt.cache import CachedReceiptExtractor
+from app.receipt.fake_provider import FakeReceiptExtractor
 from app.receipt.openai_provider import OpenAIReceiptExtractor
+from app.receipt.preprocess import PreprocessingReceiptExtractor
+from app.receipt.telemetry import InstrumentedReceiptExtractor
+
+
+def _enabled(name: str) -> bool:
+    return os.getenv(name, "true").lower() != "false"
 
 
 def get_receipt_extractor() -> ReceiptExtractor:
     """Return the configured receipt extraction provider."""
-    provider = os.getenv("RECEIPT_PROVIDER", "openai")
+    return _build_extractor(
+        os.getenv("RECEIPT_PROVIDER", "openai"),
+        _enabled("RECEIPT_PREPROCESS_ENABLED"),
+        _enabled("RECEIPT_CACHE_ENABLED"),
+    )
+
+
+@cache
+def _build_extractor(provider: str, preprocess: bool, use_cache: bool) -> ReceiptExtractor:
+    # Providers are stateless, so one instance per configuration is shared
     if provider == "openai":
-        return OpenAIReceiptExtractor()
-    raise ValueError(f"Unknown receipt provider: {provider}")
+        extractor = OpenAIReceiptExtractor()
+    elif provider == "fake":
+        extractor = FakeReceiptExtractor()
+    else:
+        raise ValueError(f"Unknown receipt provider: {provider}")
+    extractor = InstrumentedReceiptExtractor(extractor)
+    if preprocess:
+        extractor = PreprocessingReceiptExtractor(extractor)
+    if use_cache:
+        extractor = CachedReceiptExtractor(extractor)
+    return extractor
@@ -0,0 +1,50 @@
+import asyncio
+import hashlib
+import json
+import os
+
+from app.receipt.base import ReceiptExtractionResult, ReceiptLineItem
+
+
+class FakeReceiptExtractor:
+    """Deterministic offline provider for load tests and local development.
+
+    Sleeps RECEIPT_FAKE_LATENCY_MS to stand in for the model round-trip and
+    returns one of the results in RECEIPT_FAKE_FIXTURE (a JSON object or
+    list of ReceiptExtractionResult), picked by image hash so the same image
+    always yields the same result. Without a fixture, a result is derived
+    from the image hash.
+    """
+
+    name = "fake"
+
+    def __init__(self):
+        self.latency = float(os.getenv("RECEIPT_FAKE_LATENCY_MS", "800")) / 1000
+        self.fixtures: list[ReceiptExtractionResult] = []
+        fixture_path = os.getenv("RECEIPT_FAKE_FIXTURE")
+        if fixture_path:
+            with open(fixture_path) as f:
+                data = json.load(f)
+            self.fixtures = [ReceiptExtractionResult.model_validate(d) for d in (data if isinstance(data, list) else [data])]
+
+    async def extract(self, image_bytes: bytes, content_type: str, language: str = "en", fallback_currency: str = "USD") -> ReceiptExtractionResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        digest = hashlib.sha256(image_bytes).digest()
+        if self.fixtures:
+            return self.fixtures[digest[0] % len(self.fixtures)].model_copy(deep=True)
+
+        items = [
+            ReceiptLineItem(description=f"Item {i + 1}", amount=(digest[i] % 50 + 1) * 0.5, quantity=1)
+            for i in range(digest[0] % 5 + 1)
+        ]
+        subtotal = sum(item.amount for item in items)
+        tax = round(subtotal * 0.1, 2)
+        return ReceiptExtractionResult(
+            title=f"Receipt {digest[:3].hex()}",
+            line_items=items,
+            subtotal=subtotal,
+            tax=tax,
+            total=round(subtotal + tax, 2),
+            currency=fallback_currency,
+        )
@@ -0,0 +1,260 @@
+"""DB-backed queue for asynchronous receipt scans.
+
+POST .../scan-receipt?async=1 stores the image in receipt_scan_jobs and
+returns straight away; run_scan_worker claims queued rows with a
+conditional UPDATE (safe with several app processes) and runs at most
+SCAN_JOB_CONCURRENCY extractions at once. Jobs left running by a crashed or
+restarted process are requeued once their lease expires.
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import time
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import ReceiptScanJob
+from app.receipt.base import ReceiptExtractionResult
+from app.receipt.factory import get_receipt_extractor
+from app.receipt.telemetry import track_scan
+
+logger = logging.getLogger("yoyo")
+
+SCAN_JOB_CONCURRENCY = int(os.getenv("SCAN_JOB_CONCURRENCY", "4"))  # 0 disables the worker
+SCAN_JOB_POLL_INTERVAL = float(os.getenv("SCAN_JOB_POLL_INTERVAL", "2"))
+SCAN_JOB_LEASE = timedelta(seconds=int(os.getenv("SCAN_JOB_LEASE_SECONDS", "300")))
+SCAN_JOB_MAX_ATTEMPTS = int(os.getenv("SCAN_JOB_MAX_ATTEMPTS", "3"))
+SCAN_JOB_RETENTION = timedelta(hours=int(os.getenv("SCAN_JOB_RETENTION_HOURS", "24")))
+SWEEP_INTERVAL = 60.0
+
+FINISHED = ("done", "failed")
+
+# Wake-ups within this process; other processes fall back to polling
+_loop: asyncio.AbstractEventLoop | None = None
+_wake: asyncio.Event | None = None
+_job_events: dict[str, asyncio.Event] = {}
+
+
+class ScanTask(NamedTuple):
+    id: int
+    token: str
+    trip_id: int
+    image: bytes
+    content_type: str
+    language: str
+    fallback_currency: str
+    attempts: int
+
+
+def enqueue_scan(db: Session, trip_id: int, image: bytes, content_type: str, language: str, fallback_currency: str) -> str:
+    """Queue a scan and return its job token."""
+    job = ReceiptScanJob(
+        token=secrets.token_hex(16),
+        trip_id=trip_id,
+        status="queued",
+        image=image,
+        content_type=content_type,
+        language=language,
+        fallback_currency=fallback_currency,
+        attempts=0,
+    )
+    db.add(job)
+    db.commit()
+    if _loop is not None:
+        _loop.call_soon_threadsafe(_wake.set)
+    return job.token
+
+
+def get_job(db: Session, trip_id: int, token: str) -> ReceiptScanJob | None:
+    return db.query(ReceiptScanJob).filter(
+        ReceiptScanJob.token == token, ReceiptScanJob.trip_id == trip_id
+    ).first()
+
+
+def load_job(trip_id: int, token: str) -> ReceiptScanJob | None:
+    """get_job in its own session, for callers outside a request (e.g. SSE streams)."""
+    db = SessionLocal()
+    try:
+        job = get_job(db, trip_id, token)
+        if job is not None:
+            db.expunge(job)
+        return job
+    finally:
+        db.close()
+
+
+async def wait_for_job(token: str, timeout: float = SCAN_JOB_POLL_INTERVAL) -> None:
+    """Return when this process finishes the job, or after timeout."""
+    event = _job_events.setdefault(token, asyncio.Event())
+    with suppress(TimeoutError):
+        await asyncio.wait_for(event.wait(), timeout)
+
+
+def forget_job(token: str) -> None:
+    """Drop the wake-up event once nobody is waiting on the job."""
+    _job_events.pop(token, None)
+
+
+def _claim_next() -> ScanTask | None:
+    db = SessionLocal()
+    try:
+        while True:
+            row = db.query(ReceiptScanJob.id).filter(ReceiptScanJob.status == "queued").order_by(
+                ReceiptScanJob.created_at, ReceiptScanJob.id
+            ).first()
+            if row is None:
+                return None
+            claimed = db.query(ReceiptScanJob).filter(
+                ReceiptScanJob.id == row.id, ReceiptScanJob.status == "queued"
+            ).update(
+                {"status": "running", "started_at": datetime.utcnow(), "attempts": ReceiptScanJob.attempts + 1},
+                synchronize_session=False,
+            )
+            db.commit()
+            if claimed:
+                job = db.get(ReceiptScanJob, row.id)
+                return ScanTask(
+                    job.id, job.token, job.trip_id, job.image, job.content_type,
+                    job.language, job.fallback_currency, job.attempts,
+                )
+            # Another process claimed it first; try the next one
+    finally:
+        db.close()
+
+
+def _finish(job_id: int, result: ReceiptExtractionResult | None, error: str | None) -> None:
+    db = SessionLocal()
+    try:
+        db.query(ReceiptScanJob).filter(ReceiptScanJob.id == job_id).update({
+            "status": "failed" if error else "done",
+            "result": result.model_dump_json() if result else None,
+            "error": error,
+            "image": None,
+            "finished_at": datetime.utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _release(job_id: int) -> None:
+    """Put a job interrupted by shutdown back in the queue."""
+    db = SessionLocal()
+    try:
+        db.query(ReceiptScanJob).filter(
+            ReceiptScanJob.id == job_id, ReceiptScanJob.status == "running"
+        ).update({"status": "queued", "attempts": ReceiptScanJob.attempts - 1}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _sweep() -> None:
+    """Requeue (or fail) jobs whose lease expired and delete old finished jobs."""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        expired = db.query(ReceiptScanJob).filter(
+            ReceiptScanJob.status == "running", ReceiptScanJob.started_at < now - SCAN_JOB_LEASE
+        )
+        expired.filter(ReceiptScanJob.attempts >= SCAN_JOB_MAX_ATTEMPTS).update({
+            "status": "failed",
+            "error": "Scan did not complete. Please try again.",
+            "image": None,
+            "finished_at": now,
+        }, synchronize_session=False)
+        expired.update({"status": "queued"}, synchronize_session=False)
+        db.query(ReceiptScanJob).filter(
+            ReceiptScanJob.status.in_(FINISHED), ReceiptScanJob.finished_at < now - SCAN_JOB_RETENTION
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _run(task: ScanTask, slots: asyncio.Semaphore) -> None:
+    start = time.perf_counter()
+    result, error = None, None
+    try:
+        try:
+            extractor = get_receipt_extractor()
+            with track_scan(extractor, task.language, len(task.image), endpoint="job", trip_id=task.trip_id, job_id=task.id):
+                result = await extractor.extract(
+                    task.image, task.content_type, language=task.language, fallback_currency=task.fallback_currency
+                )
+        except asyncio.CancelledError:
+            _release(task.id)
+            raise
+        except ValueError as e:
+            logger.error(f"Receipt extraction config error: {e}")
+            error = "Receipt scanning is not available"
+        except Exception as e:
+            logger.error(f"Receipt extraction failed: {e}", exc_info=True)
+            error = "Failed to extract receipt data. Please try again."
+        await asyncio.to_thread(_finish, task.id, result, error)
+        event = _job_events.pop(task.token, None)
+        if event is not None:
+            event.set()
+        logger.info(
+            "Receipt scan job finished",
+            extra={"extra_data": {
+                "trip_id": task.trip_id,
+                "job_id": task.id,
+                "status": "failed" if error else "done",
+                "attempts": task.attempts,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            }},
+        )
+    finally:
+        slots.release()
+
+
+async def run_scan_worker(concurrency: int = SCAN_JOB_CONCURRENCY) -> None:
+    """Claim and run queued scans, at most `concurrency` at a time, until cancelled."""
+    global _loop, _wake
+    _loop, _wake = asyncio.get_running_loop(), asyncio.Event()
+    slots = asyncio.Semaphore(concurrency)
+    running: set[asyncio.Task] = set()
+    last_sweep = 0.0
+    try:
+        while True:
+            if time.monotonic() - last_sweep >= SWEEP_INTERVAL:
+                try:
+                    await asyncio.to_thread(_sweep)
+                except Exception:
+                    logger.error("Receipt scan job sweep failed", exc_info=True)
+                last_sweep = time.monotonic()
+
+            await slots.acquire()
+            _wake.clear()
+            try:
+                task = await asyncio.to_thread(_claim_next)
+            except Exception:
+                logger.error("Receipt scan job claim failed", exc_info=True)
+                task = None
+            if task is None:
+                slots.release()
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(_wake.wait(), SCAN_JOB_POLL_INTERVAL)
+                continue
+            job = asyncio.create_task(_run(task, slots))
+            running.add(job)
+            job.add_done_callback(running.discard)
+    finally:
+        for job in running:
+            job.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        _loop = _wake = None
+
+
+def start_scan_worker() -> asyncio.Task | None:
+    """Start the scan worker unless SCAN_JOB_CONCURRENCY is 0."""
+    if SCAN_JOB_CONCURRENCY <= 0:
+        return None
+    return asyncio.create_task(run_scan_worker())
@@ -0,0 +1,28 @@
+from app.receipt.base import ReceiptExtractionResult
+
+
+def merge_pages(pages: list[ReceiptExtractionResult]) -> ReceiptExtractionResult:
+    """Combine the pages of one long receipt, in order, into a single result.
+
+    Line items are concatenated. Summary fields (subtotal, tax, total, ...)
+    normally appear once, on the last page, so the last non-null value wins;
+    title and currency come from the first page that has them.
+    """
+
+    def first(field: str):
+        return next((getattr(p, field) for p in pages if getattr(p, field) is not None), None)
+
+    def last(field: str):
+        return next((getattr(p, field) for p in reversed(pages) if getattr(p, field) is not None), None)
+
+    return ReceiptExtractionResult(
+        title=first("title"),
+        line_items=[item for p in pages for item in p.line_items],
+        subtotal=last("subtotal"),
+        tax=last("tax"),
+        tips=last("tips"),
+        discount=last("discount"),
+        fees=last("fees"),
+        total=last("total"),
+        currency=first("currency"),
+    )
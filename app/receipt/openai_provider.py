@@ -4,6 +4,7 @@ from datetime import datetime, timezone
 from agents import Agent, Runner
 
 from app.receipt.base import ReceiptExtractionResult
+from app.receipt.telemetry import current
 
 INSTRUCTIONS = """\
 You are a receipt parser. Given a receipt image, extract a title, individual line items, and extras.
@@ -39,9 +40,12 @@ agent = Agent(
 class OpenAIReceiptExtractor:
     """Receipt extraction using OpenAI Agents SDK with GPT-4o vision."""
 
+    name = "openai"
+
     async def extract(self, image_bytes: bytes, content_type: str, language: str = "en", fallback_currency: str = "USD") -> ReceiptExtractionResult:
         b64_image = base64.b64encode(image_bytes).decode("utf-8")
         media_type = content_type or "image/jpeg"
+        image_url = f"data:{media_type};base64,{b64_image}"
         now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
 
         prompt = (
@@ -58,10 +62,17 @@ class OpenAIReceiptExtractor:
                     "role": "user",
                     "content": [
                         {"type": "input_text", "text": prompt},
-                        {"type": "input_image", "image_url": f"data:{media_type};base64,{b64_image}"},
+                        {"type": "input_image", "image_url": image_url},
                     ],
                 }
             ],
         )
 
+        telemetry = current()
+        if telemetry is not None:
+            usage = result.context_wrapper.usage
+            telemetry.encoded_bytes = len(image_url)
+            telemetry.input_tokens = usage.input_tokens
+            telemetry.output_tokens = usage.output_tokens
+
         return result.final_output
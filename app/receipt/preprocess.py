@@ -0,0 +1,91 @@
+"""Downscale and recompress receipt photos before they are sent upstream.
+
+Phone photos are often 4000px+ and several MB; the vision model gains
+nothing past RECEIPT_MAX_EDGE, so the image is decoded, rotated upright
+from its EXIF orientation, shrunk and re-encoded as JPEG. Decoding runs
+in a small thread pool (Pillow releases the GIL) to keep the event loop free.
+"""
+
+import asyncio
+import importlib.util
+import io
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.receipt.base import ReceiptExtractionResult, ReceiptExtractor
+
+logger = logging.getLogger("yoyo")
+
+RECEIPT_MAX_EDGE = int(os.getenv("RECEIPT_MAX_EDGE", "2048"))
+RECEIPT_JPEG_QUALITY = int(os.getenv("RECEIPT_JPEG_QUALITY", "85"))
+RECEIPT_PREPROCESS_WORKERS = int(os.getenv("RECEIPT_PREPROCESS_WORKERS", "2"))
+
+# Pillow is required for preprocessing; HEIC/HEIF decoding needs the optional
+# pillow-heif package (pip install "yoyo-server[heic]")
+PILLOW = importlib.util.find_spec("PIL") is not None
+if PILLOW:
+    from PIL import Image, ImageOps
+
+    if importlib.util.find_spec("pillow_heif") is not None:
+        from pillow_heif import register_heif_opener
+
+        register_heif_opener()
+
+_executor = ThreadPoolExecutor(max_workers=RECEIPT_PREPROCESS_WORKERS, thread_name_prefix="receipt-preprocess")
+
+
+def _preprocess(image_bytes: bytes, content_type: str) -> tuple[bytes, str, tuple[int, int]]:
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        # Let the JPEG decoder scale by 1/2..1/8 while decoding
+        img.draft("RGB", (RECEIPT_MAX_EDGE, RECEIPT_MAX_EDGE))
+        orientation = img.getexif().get(0x0112, 1)
+        oversized = max(img.size) > RECEIPT_MAX_EDGE
+        if not oversized and orientation == 1 and content_type == "image/jpeg":
+            return image_bytes, content_type, img.size
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((RECEIPT_MAX_EDGE, RECEIPT_MAX_EDGE), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=RECEIPT_JPEG_QUALITY, optimize=True)
+    if not oversized and orientation == 1 and out.tell() >= len(image_bytes):
+        return image_bytes, content_type, img.size
+    return out.getvalue(), "image/jpeg", img.size
+
+
+async def preprocess_image(image_bytes: bytes, content_type: str) -> tuple[bytes, str]:
+    """Return (bytes, content_type) ready for the provider; the input on any failure."""
+    if not PILLOW:
+        return image_bytes, content_type
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        out, out_type, size = await loop.run_in_executor(_executor, _preprocess, image_bytes, content_type)
+    except Exception as e:
+        # Let the provider decide what to do with an image Pillow can't read
+        logger.warning(f"Receipt image preprocessing failed: {e}")
+        return image_bytes, content_type
+    logger.info(
+        "Receipt image preprocessed",
+        extra={"extra_data": {
+            "bytes_in": len(image_bytes),
+            "bytes_out": len(out),
+            "width": size[0],
+            "height": size[1],
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+        }},
+    )
+    return out, out_type
+
+
+class PreprocessingReceiptExtractor:
+    """Wraps a provider and hands it a downscaled copy of the image."""
+
+    def __init__(self, inner: ReceiptExtractor):
+        self.inner = inner
+        self.name = getattr(inner, "name", type(inner).__name__)
+        self.provider = getattr(inner, "provider", type(inner).__name__)
+
+    async def extract(self, image_bytes: bytes, content_type: str, language: str = "en", fallback_currency: str = "USD") -> ReceiptExtractionResult:
+        image_bytes, content_type = await preprocess_image(image_bytes, content_type)
+        return await self.inner.extract(image_bytes, content_type, language=language, fallback_currency=fallback_currency)
@@ -0,0 +1,119 @@
+"""Per-scan telemetry collected across the extractor layers.
+
+track_scan() puts a ScanTelemetry in a context variable; the cache,
+preprocessing and provider layers fill in what they know, and on exit the
+record is logged as one structured line and fed to the histograms in
+app.metrics. Each asyncio task gets its own copy of the context, so
+concurrent scans (batches, job workers) never share a record.
+"""
+
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+
+from app.metrics import (
+    RECEIPT_CACHE_LOOKUPS,
+    RECEIPT_ENCODED_BYTES,
+    RECEIPT_PROVIDER_SECONDS,
+    RECEIPT_SCAN_ERRORS,
+    RECEIPT_SCAN_SECONDS,
+    RECEIPT_TOKENS,
+    RECEIPT_UPLOAD_BYTES,
+)
+from app.receipt.base import ReceiptExtractionResult, ReceiptExtractor
+
+logger = logging.getLogger("yoyo")
+
+_current: ContextVar["ScanTelemetry | None"] = ContextVar("receipt_scan_telemetry", default=None)
+
+
+@dataclass
+class ScanTelemetry:
+    provider: str
+    language: str
+    upload_bytes: int
+    provider_bytes: int | None = None  # image handed to the provider, after preprocessing
+    encoded_bytes: int | None = None  # payload the provider sent upstream (e.g. base64)
+    provider_ms: float | None = None
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+    cache_hit: bool | None = None  # None when the cache is disabled
+    error_class: str | None = None
+
+
+def current() -> ScanTelemetry | None:
+    """The record for the scan running in this context, if any."""
+    return _current.get()
+
+
+def _language_label(language: str) -> str:
+    # Accept-Language is client-controlled; keep metric label values bounded
+    primary = language.split("-")[0].lower()
+    return primary if re.fullmatch(r"[a-z]{2,3}", primary) else "other"
+
+
+@contextmanager
+def track_scan(extractor: ReceiptExtractor, language: str, upload_bytes: int, **log_fields):
+    """Collect telemetry for one extract() call made inside the block."""
+    telemetry = ScanTelemetry(
+        provider=getattr(extractor, "name", type(extractor).__name__),
+        language=_language_label(language),
+        upload_bytes=upload_bytes,
+    )
+    token = _current.set(telemetry)
+    start = time.perf_counter()
+    try:
+        yield telemetry
+    except Exception as e:
+        telemetry.error_class = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        _record(telemetry, time.perf_counter() - start, log_fields)
+
+
+def _record(t: ScanTelemetry, seconds: float, log_fields: dict) -> None:
+    outcome = "error" if t.error_class else "hit" if t.cache_hit else "ok"
+    RECEIPT_SCAN_SECONDS.labels(t.provider, t.language, outcome).observe(seconds)
+    RECEIPT_UPLOAD_BYTES.labels(t.provider).observe(t.upload_bytes)
+    if t.cache_hit is not None:
+        RECEIPT_CACHE_LOOKUPS.labels("hit" if t.cache_hit else "miss").inc()
+    if t.provider_ms is not None:
+        RECEIPT_PROVIDER_SECONDS.labels(t.provider, t.language).observe(t.provider_ms / 1000)
+    if t.encoded_bytes is not None:
+        RECEIPT_ENCODED_BYTES.labels(t.provider).observe(t.encoded_bytes)
+    if t.input_tokens is not None:
+        RECEIPT_TOKENS.labels(t.provider, "input").observe(t.input_tokens)
+    if t.output_tokens is not None:
+        RECEIPT_TOKENS.labels(t.provider, "output").observe(t.output_tokens)
+    if t.error_class:
+        RECEIPT_SCAN_ERRORS.labels(t.provider, t.error_class).inc()
+
+    logger.info(
+        "Receipt scan telemetry",
+        extra={"extra_data": {**log_fields, **asdict(t), "duration_ms": round(seconds * 1000, 2), "outcome": outcome}},
+    )
+
+
+class InstrumentedReceiptExtractor:
+    """Innermost wrapper: times the provider call itself."""
+
+    def __init__(self, inner: ReceiptExtractor):
+        self.inner = inner
+        self.name = getattr(inner, "name", type(inner).__name__)
+        # Cache keys were built from the provider class name; keep them stable
+        self.provider = type(inner).__name__
+
+    async def extract(self, image_bytes: bytes, content_type: str, language: str = "en", fallback_currency: str = "USD") -> ReceiptExtractionResult:
+        telemetry = current()
+        if telemetry is not None:
+            telemetry.provider_bytes = len(image_bytes)
+        start = time.perf_counter()
+        try:
+            return await self.inner.extract(image_bytes, content_type, language=language, fallback_currency=fallback_currency)
+        finally:
+            if telemetry is not None:
+                telemetry.provider_ms = round((time.perf_counter() - start) * 1000, 2)
@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.balances import (
-    compute_net_balances,
     convert_balances_to_currency,
     get_settled_by_map,
     simplify_debts,
     simplify_debts_in_currency,
 )
+from app.conditional import cache_headers, etag_matches, make_etag, not_modified
 from app.database import get_db
-from app.deps import get_trip_by_token
-from app.exchange import get_rates_for_currencies
-from app.serializers import serialize_expense, serialize_settlement, serialize_member
+from app.deps import get_trip_aggregate
+from app.exchange import get_rates_for_currencies_async
+from app.ledger import load_net_balances
+from app.serializers import serialize_member
+from app.timing import phase
 
 router = APIRouter()
 
@@ -26,19 +29,24 @@ def _to_plain_settlement(settlement_dict: dict) -> dict:
     return settlement_dict
 
 
-@router.get("/trips/{access_token}/balances")
-def get_balances(access_token: str, db: Session = Depends(get_db)):
-    trip = get_trip_by_token(access_token, db)
+def _load_balance_inputs(access_token: str, db: Session):
+    # Balances come from the ledger, so only members are needed from the graph
+    trip = get_trip_aggregate(access_token, db, members_only=True)
 
     # Serialize ORM objects to plain dicts (string IDs, camelCase keys)
     members = [serialize_member(m) for m in trip.members]
-    expenses = [serialize_expense(e) for e in trip.expenses]
-    settlements = [serialize_settlement(s) for s in trip.settlements]
 
-    trip_currency = trip.currency
+    # Net balances are maintained incrementally by app.ledger on every write
+    net_balances = load_net_balances(db, trip.id)
+    return trip, members, net_balances
+
 
-    # Compute net balances
-    net_balances = compute_net_balances(expenses, settlements, trip_currency)
+@router.get("/trips/{access_token}/balances")
+async def get_balances(access_token: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    # Database work stays on a worker thread; a rate fetch is awaited on the loop
+    trip, members, net_balances = await run_in_threadpool(_load_balance_inputs, access_token, db)
+
+    trip_currency = trip.currency
     settled_by = get_settled_by_map(members)
 
     # Determine if consolidated mode
@@ -59,7 +67,7 @@ def get_balances(access_token: str, db: Session = Depends(get_db)):
             if sc:
                 all_currencies.add(sc)
 
-        rates, rate_date = get_rates_for_currencies(db, rates_target, list(all_currencies))
+        rates, rate_date, stale = await get_rates_for_currencies_async(db, rates_target, list(all_currencies))
         rates_dict = {
             "target": rates_target,
             "rates": rates,
@@ -68,17 +76,32 @@ def get_balances(access_token: str, db: Session = Depends(get_db)):
             "target": rates_target,
             "rates": rates,
             "date": rate_date.isoformat() if rate_date else None,
+            "stale": stale,
         }
 
-    if is_consolidated and rates_dict:
-        debts = simplify_debts_in_currency(
-            net_balances, settled_by, trip.settlement_currency, rates_dict, members
-        )
-        consolidated_balances = convert_balances_to_currency(
-            net_balances, trip.settlement_currency, rates_dict
-        )
-    else:
-        debts = simplify_debts(net_balances, settled_by, members, rates_dict)
+    # Balances only change with the trip version and the rates in use. Key on
+    # the rate date rather than the float values, which differ in the last
+    # digits between a fresh fetch and a cache read of the same quotes.
+    etag = make_etag(
+        "balances", trip.id, trip.updated_at.isoformat(), rates_target,
+        exchange_rates_response["date"] if exchange_rates_response else None,
+        sorted(all_currencies) if rates_target else None,
+        exchange_rates_response["stale"] if exchange_rates_response else None,
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
+
+    with phase("balance-compute"):
+        if is_consolidated and rates_dict:
+            debts = simplify_debts_in_currency(
+                net_balances, settled_by, trip.settlement_currency, rates_dict, members
+            )
+            consolidated_balances = convert_balances_to_currency(
+                net_balances, trip.settlement_currency, rates_dict
+            )
+        else:
+            debts = simplify_debts(net_balances, settled_by, members, rates_dict)
 
     return {
         "netBalances": net_balances,
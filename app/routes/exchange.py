@@ -1,49 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from app.conditional import cache_headers, etag_matches, make_etag, not_modified
 from app.database import get_db
 from app.deps import get_trip_by_token
-from app.exchange import get_rates_for_currencies, SUPPORTED_CURRENCIES
+from app.exchange import get_rates_for_currencies_async, SUPPORTED_CURRENCIES
+from app.ledger import load_net_balances
+from app.models import Trip
 
 router = APIRouter()
 
 
+def _currencies_used(access_token: str, db: Session) -> tuple[Trip, set[str]]:
+    trip = get_trip_by_token(access_token, db)
+
+    # Collect all currencies used in expenses, settlements, and member preferences.
+    # The balance ledger has a row per currency in use, so no expenses are loaded.
+    currencies_used: set[str] = set(load_net_balances(db, trip.id))
+    for member in trip.members:
+        if member.settlement_currency:
+            currencies_used.add(member.settlement_currency)
+    return trip, currencies_used
+
+
 @router.get("/trips/{access_token}/exchange-rates")
-def get_exchange_rates(
+async def get_exchange_rates(
     access_token: str,
+    request: Request,
+    response: Response,
     target: str = Query(..., description="Target settlement currency"),
     db: Session = Depends(get_db),
 ):
     if target not in SUPPORTED_CURRENCIES:
         raise HTTPException(status_code=400, detail="Invalid target currency")
 
-    trip = get_trip_by_token(access_token, db)
-
-    # Collect all currencies used in expenses, settlements, and member preferences
-    currencies_used: set[str] = set()
-    for expense in trip.expenses:
-        currencies_used.add(expense.currency or trip.currency)
-    for settlement in trip.settlements:
-        currencies_used.add(settlement.currency or trip.currency)
-    for member in trip.members:
-        if member.settlement_currency:
-            currencies_used.add(member.settlement_currency)
+    trip, currencies_used = await run_in_threadpool(_currencies_used, access_token, db)
 
     # If only one currency is used and it matches target, no rates needed
     if currencies_used <= {target}:
-        return {"target": target, "rates": {}, "date": None}
+        rates, rate_date, stale = {}, None, False
+    else:
+        try:
+            rates, rate_date, stale = await get_rates_for_currencies_async(
+                db, target, list(currencies_used)
+            )
+        except Exception:
+            raise HTTPException(
+                status_code=502, detail="Failed to fetch exchange rates"
+            )
 
-    try:
-        rates, rate_date = get_rates_for_currencies(
-            db, target, list(currencies_used)
-        )
-    except Exception:
-        raise HTTPException(
-            status_code=502, detail="Failed to fetch exchange rates"
-        )
+    # Keyed on what the rates are derived from, not the float values, which
+    # differ in the last digits between a fresh fetch and a cache read
+    etag = make_etag(
+        "exchange-rates", trip.id, trip.updated_at.isoformat(), target, rate_date, sorted(currencies_used), stale,
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
 
     return {
         "target": target,
         "rates": rates,
         "date": rate_date.isoformat() if rate_date else None,
+        "stale": stale,
     }
@@ -5,8 +5,9 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.models import Expense, ExpenseMember, Member
+from app.models import Expense, ExpenseMember, Member, Trip
 from app.deps import get_trip_by_token, verify_creator
+from app.ledger import record_expense, revert_expense
 from app.schemas import ExpenseIn
 from app.serializers import serialize_expense
 
@@ -41,16 +42,8 @@ def _sync_expense_members(db: Session, expense: Expense, involved_members: list[
         db.add(em)
 
 
-@router.post("/trips/{access_token}/expenses", status_code=201)
-def add_expense(
-    access_token: str,
-    data: ExpenseIn,
-    request: Request,
-    db: Session = Depends(get_db),
-):
-    trip = get_trip_by_token(access_token, db)
-    if not trip.allow_member_edit_expenses:
-        verify_creator(trip, request, db)
+def create_expense(db: Session, trip: Trip, data: ExpenseIn) -> Expense:
+    """Validate and add an expense, updating the ledger; the caller commits."""
     _validate_expense_members(db, trip.id, data.involved_members, data.paid_by)
 
     expense = Expense(
@@ -66,8 +59,26 @@ def add_expense(
     db.flush()
 
     _sync_expense_members(db, expense, data.involved_members, data.split_details)
+    db.flush()
+    db.refresh(expense)
+    record_expense(db, trip, serialize_expense(expense))
 
     trip.updated_at = datetime.utcnow()
+    return expense
+
+
+@router.post("/trips/{access_token}/expenses", status_code=201)
+def add_expense(
+    access_token: str,
+    data: ExpenseIn,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    trip = get_trip_by_token(access_token, db)
+    if not trip.allow_member_edit_expenses:
+        verify_creator(trip, request, db)
+
+    expense = create_expense(db, trip, data)
     db.commit()
     db.refresh(expense)
     logger.info("Expense added", extra={"extra_data": {"trip_id": trip.id, "expense_id": expense.id}})
@@ -92,6 +103,7 @@ def update_expense(
         raise HTTPException(status_code=404, detail="Expense not found")
 
     _validate_expense_members(db, trip.id, data.involved_members, data.paid_by)
+    revert_expense(db, trip, serialize_expense(expense))
 
     expense.description = data.description
     expense.amount = data.amount
@@ -101,6 +113,9 @@ def update_expense(
     expense.currency = data.currency
 
     _sync_expense_members(db, expense, data.involved_members, data.split_details)
+    db.flush()
+    db.refresh(expense)
+    record_expense(db, trip, serialize_expense(expense))
 
     trip.updated_at = datetime.utcnow()
     db.commit()
@@ -125,6 +140,7 @@ def delete_expense(
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
 
+    revert_expense(db, trip, serialize_expense(expense))
     db.delete(expense)
     trip.updated_at = datetime.utcnow()
     db.commit()
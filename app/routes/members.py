@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import Member, Expense, ExpenseMember, Settlement
-from app.deps import get_trip_by_token, get_or_create_user, verify_creator
+from app.deps import get_trip_aggregate, get_trip_by_token, get_or_create_user, verify_creator
 from app.exchange import SUPPORTED_CURRENCIES
 from app.schemas import AddMemberIn, JoinTripIn, UpdateMemberIn
 from app.serializers import serialize_member, serialize_trip
@@ -156,6 +156,7 @@ def claim_member(
     ).update({"user_id": None})
 
     member.user_id = user.id
+    trip.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(member)
     logger.info("Member claimed", extra={"extra_data": {"trip_id": trip.id, "member_id": member.id, "user_id": user.id}})
@@ -198,6 +199,6 @@ def join_trip(
     member.user_id = user.id
     trip.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(trip)
+    trip = get_trip_aggregate(access_token, db)
     logger.info("Member joined", extra={"extra_data": {"trip_id": trip.id, "member_name": data.name, "user_id": user.id}})
     return serialize_trip(trip, is_creator=False, user_id=user.id)
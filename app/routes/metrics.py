@@ -0,0 +1,25 @@
+import os
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import MULTIPROCESS, render_metrics, sample_threadpool
+
+# Optional bearer token for scrapers; unset leaves /metrics open
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if not secrets.compare_digest(supplied, METRICS_TOKEN):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    if not MULTIPROCESS:
+        sample_threadpool()
+    # Multiprocess aggregation reads every worker's files, so keep it off the loop
+    body, content_type = await run_in_threadpool(render_metrics)
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.profiling import profile_authorized, read_profile
+
+router = APIRouter()
+
+
+@router.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str, request: Request):
+    """Download a stored profile in folded-stack format."""
+    if not profile_authorized(request.scope):
+        raise HTTPException(status_code=401, detail="Invalid profile token")
+    profile = await run_in_threadpool(read_profile, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile)
@@ -1,12 +1,31 @@
+import asyncio
+import json
 import logging
+import os
+from collections.abc import Callable, Coroutine
+from datetime import date
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, UploadFile, File
+from fastapi import APIRouter, Depends, Form, Header, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.deps import get_trip_by_token, verify_creator
+from app.exchange import SUPPORTED_CURRENCIES
+from app.models import ReceiptScanJob, Trip
+from app.receipt.allocate import allocate_items, receipt_total
 from app.receipt.base import ReceiptExtractionResult
 from app.receipt.factory import get_receipt_extractor
+from app.receipt.jobs import FINISHED, enqueue_scan, forget_job, get_job, load_job, wait_for_job
+from app.receipt.merge import merge_pages
+from app.receipt.telemetry import track_scan
+from app.routes.expenses import create_expense
+from app.schemas import ExpenseIn, ScanExpenseIn
+from app.serializers import serialize_expense
 
 
 def _parse_language(accept_language: str | None) -> str:
@@ -18,12 +37,115 @@ def _parse_language(accept_language: str | None) -> str:
     return primary or "en"
 
 logger = logging.getLogger("yoyo")
-router = APIRouter()
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+MAX_BODY_SIZE = MAX_FILE_SIZE + 64 * 1024  # room for multipart framing and form fields
+READ_CHUNK_SIZE = 64 * 1024
+MAX_BATCH_FILES = 10
+MAX_BATCH_SIZE = 30 * 1024 * 1024  # 30 MB across all images in one batch
+BATCH_SCAN_CONCURRENCY = int(os.getenv("BATCH_SCAN_CONCURRENCY", "3"))
 ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic", "image/heif"}
 
 
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=400, detail="Image too large. Maximum size is 10 MB.")
+
+
+def _batch_too_large() -> HTTPException:
+    return HTTPException(status_code=400, detail="Images too large. Maximum total size is 30 MB.")
+
+
+class BoundedUploadRoute(APIRoute):
+    """Enforce max_body_size before and while the multipart body is parsed.
+
+    FastAPI reads the whole form before the endpoint runs, so the cap has to
+    sit in front of it: a declared Content-Length is checked up front and the
+    bytes actually received are counted, aborting as soon as the cap is hit.
+    """
+
+    max_body_size = MAX_BODY_SIZE
+    too_large = staticmethod(_too_large)
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[None, None, Response]]:
+        handler = super().get_route_handler()
+
+        async def bounded_handler(request: Request) -> Response:
+            length = request.headers.get("content-length")
+            if length is not None and (not length.isdigit() or int(length) > self.max_body_size):
+                raise self.too_large()
+
+            received = 0
+
+            async def receive():
+                nonlocal received
+                message = await request.receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > self.max_body_size:
+                        raise self.too_large()
+                return message
+
+            return await handler(Request(request.scope, receive))
+
+        return bounded_handler
+
+
+class BoundedBatchUploadRoute(BoundedUploadRoute):
+    max_body_size = MAX_BATCH_SIZE + 64 * 1024
+    too_large = staticmethod(_batch_too_large)
+
+
+router = APIRouter(route_class=BoundedUploadRoute)
+batch_router = APIRouter(route_class=BoundedBatchUploadRoute)
+
+
+async def _read_image(file: UploadFile) -> bytes:
+    """Validate and read an uploaded image in chunks, stopping at MAX_FILE_SIZE."""
+    if file.content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported image format. Use JPEG, PNG, or WebP.")
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise _too_large()
+
+    chunks = []
+    total = 0
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        total += len(chunk)
+        if total > MAX_FILE_SIZE:
+            raise _too_large()
+        chunks.append(chunk)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+    return b"".join(chunks)
+
+
+def _authorize_scan(access_token: str, request: Request, db: Session) -> tuple[int, str]:
+    """Check access to the trip and return (trip id, currency).
+
+    Runs in the threadpool and closes the session before returning, so no
+    pooled connection is held while the upload is read or the provider runs.
+    """
+    trip = get_trip_by_token(access_token, db)
+    if not trip.allow_member_edit_expenses:
+        verify_creator(trip, request, db)
+    trip_id, currency = trip.id, trip.currency
+    db.close()
+    return trip_id, currency
+
+
+async def _extract(image_bytes: bytes, content_type: str, language: str, fallback_currency: str, **log_fields) -> ReceiptExtractionResult:
+    """Run the configured extractor, mapping failures to 503/502."""
+    try:
+        extractor = get_receipt_extractor()
+        with track_scan(extractor, language, len(image_bytes), **log_fields):
+            return await extractor.extract(image_bytes, content_type, language=language, fallback_currency=fallback_currency)
+    except ValueError as e:
+        logger.error(f"Receipt extraction config error: {e}")
+        raise HTTPException(status_code=503, detail="Receipt scanning is not available")
+    except Exception as e:
+        logger.error(f"Receipt extraction failed: {e}", exc_info=True)
+        raise HTTPException(status_code=502, detail="Failed to extract receipt data. Please try again.")
+
+
 def _serialize_result(result: ReceiptExtractionResult) -> dict:
     extras = sum(v for v in (result.tax, result.tips, result.fees) if v) - (result.discount or 0)
     return {
@@ -43,32 +165,27 @@ def _serialize_result(result: ReceiptExtractionResult) -> dict:
     }
 
 
+def _serialize_job(job: ReceiptScanJob) -> dict:
+    result = ReceiptExtractionResult.model_validate_json(job.result) if job.result else None
+    return {
+        "jobId": job.token,
+        "status": job.status,
+        "result": _serialize_result(result) if result else None,
+        "error": job.error,
+    }
+
+
 @router.post("/scan-receipt")
 async def scan_receipt_standalone(
     file: UploadFile = File(...),
     accept_language: str | None = Header(None),
     fallback_currency: str = Query("USD"),
 ):
-    if file.content_type not in ALLOWED_CONTENT_TYPES:
-        raise HTTPException(status_code=400, detail="Unsupported image format. Use JPEG, PNG, or WebP.")
-
-    image_bytes = await file.read()
-    if len(image_bytes) == 0:
-        raise HTTPException(status_code=400, detail="Empty file")
-    if len(image_bytes) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="Image too large. Maximum size is 10 MB.")
+    image_bytes = await _read_image(file)
 
     language = _parse_language(accept_language)
 
-    try:
-        extractor = get_receipt_extractor()
-        result = await extractor.extract(image_bytes, file.content_type, language=language, fallback_currency=fallback_currency)
-    except ValueError as e:
-        logger.error(f"Receipt extraction config error: {e}")
-        raise HTTPException(status_code=503, detail="Receipt scanning is not available")
-    except Exception as e:
-        logger.error(f"Receipt extraction failed: {e}", exc_info=True)
-        raise HTTPException(status_code=502, detail="Failed to extract receipt data. Please try again.")
+    result = await _extract(image_bytes, file.content_type, language, fallback_currency, endpoint="standalone")
 
     logger.info("Standalone receipt scanned", extra={"extra_data": {"items_count": len(result.line_items)}})
 
@@ -81,36 +198,211 @@ async def scan_receipt(
     request: Request,
     file: UploadFile = File(...),
     accept_language: str | None = Header(None),
+    run_async: bool = Query(False, alias="async"),
     db: Session = Depends(get_db),
 ):
-    trip = get_trip_by_token(access_token, db)
-    if not trip.allow_member_edit_expenses:
-        verify_creator(trip, request, db)
+    trip_id, currency = await run_in_threadpool(_authorize_scan, access_token, request, db)
 
-    if file.content_type not in ALLOWED_CONTENT_TYPES:
-        raise HTTPException(status_code=400, detail="Unsupported image format. Use JPEG, PNG, or WebP.")
+    image_bytes = await _read_image(file)
+
+    language = _parse_language(accept_language)
+
+    if run_async:
+        token = await run_in_threadpool(
+            enqueue_scan, db, trip_id, image_bytes, file.content_type, language, currency
+        )
+        logger.info("Receipt scan queued", extra={"extra_data": {"trip_id": trip_id}})
+        return JSONResponse(status_code=202, content={"jobId": token, "status": "queued"})
+
+    result = await _extract(image_bytes, file.content_type, language, currency, endpoint="trip", trip_id=trip_id)
+
+    logger.info(
+        "Receipt scanned",
+        extra={"extra_data": {"trip_id": trip_id, "items_count": len(result.line_items)}},
+    )
+
+    return _serialize_result(result)
+
+
+def _save_scanned_expense(db: Session, trip_id: int, data: ExpenseIn) -> dict:
+    trip = db.get(Trip, trip_id)
+    expense = create_expense(db, trip, data)
+    db.commit()
+    db.refresh(expense)
+    return serialize_expense(expense)
 
-    image_bytes = await file.read()
-    if len(image_bytes) == 0:
-        raise HTTPException(status_code=400, detail="Empty file")
-    if len(image_bytes) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="Image too large. Maximum size is 10 MB.")
 
+@router.post("/trips/{access_token}/scan-expense", status_code=201)
+async def scan_expense(
+    access_token: str,
+    request: Request,
+    file: UploadFile = File(...),
+    data: str = Form(...),
+    accept_language: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Scan a receipt and save it as an expense in one round-trip.
+
+    `data` is a JSON-encoded ScanExpenseIn. Without item_members the total is
+    split evenly between involved_members; with it, each item is split between
+    its assigned members and tax/tips/fees/discount follow each member's share.
+    """
+    try:
+        spec = ScanExpenseIn.model_validate_json(data)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+    trip_id, trip_currency = await run_in_threadpool(_authorize_scan, access_token, request, db)
+    image_bytes = await _read_image(file)
     language = _parse_language(accept_language)
+    result = await _extract(image_bytes, file.content_type, language, trip_currency, endpoint="scan-expense", trip_id=trip_id)
+
+    currency = spec.currency or (result.currency if result.currency in SUPPORTED_CURRENCIES else None)
+    if currency is not None and currency not in SUPPORTED_CURRENCIES:
+        raise HTTPException(status_code=400, detail="Unsupported currency")
+    if spec.item_members is None:
+        amount = receipt_total(result, currency or trip_currency)
+        split_method, involved, split_details = "even", spec.involved_members, {}
+    else:
+        amount, shares = allocate_items(result, currency or trip_currency, spec.item_members, spec.involved_members)
+        shares = {mid: share for mid, share in shares.items() if share}
+        split_method, involved, split_details = "amount", list(shares), shares
+    if amount <= 0:
+        raise HTTPException(status_code=422, detail="Could not read a total from the receipt")
+
+    expense = await run_in_threadpool(_save_scanned_expense, db, trip_id, ExpenseIn(
+        description=(spec.description or result.title or "Receipt")[:500],
+        amount=amount,
+        paid_by=spec.paid_by,
+        date=spec.date or date.today().isoformat(),
+        split_method=split_method,
+        split_details=split_details,
+        involved_members=involved,
+        currency=currency,
+    ))
+    logger.info("Expense added from receipt", extra={"extra_data": {"trip_id": trip_id, "expense_id": int(expense["id"])}})
+
+    return {"expense": expense, "receipt": _serialize_result(result)}
+
+
+@router.get("/trips/{access_token}/scan-jobs/{job_id}")
+def get_scan_job(access_token: str, job_id: str, db: Session = Depends(get_db)):
+    trip = get_trip_by_token(access_token, db)
+    job = get_job(db, trip.id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return _serialize_job(job)
 
+
+@router.get("/trips/{access_token}/scan-jobs/{job_id}/events")
+def stream_scan_job(access_token: str, job_id: str, db: Session = Depends(get_db)):
+    """Server-sent events: a `status` event on every change, ending once the job finishes."""
+    trip = get_trip_by_token(access_token, db)
+    if not get_job(db, trip.id, job_id):
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    trip_id = trip.id
+
+    async def events():
+        last_status = None
+        try:
+            while True:
+                job = await run_in_threadpool(load_job, trip_id, job_id)
+                if job is None:
+                    return
+                if job.status != last_status:
+                    last_status = job.status
+                    yield f"event: status\ndata: {json.dumps(_serialize_job(job))}\n\n"
+                    if job.status in FINISHED:
+                        return
+                else:
+                    yield ": keep-alive\n\n"
+                await wait_for_job(job_id)
+        finally:
+            forget_job(job_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@batch_router.post("/trips/{access_token}/scan-receipts")
+async def scan_receipts(
+    access_token: str,
+    request: Request,
+    files: list[UploadFile] = File(...),
+    accept_language: str | None = Header(None),
+    merge: bool = Query(False),
+    db: Session = Depends(get_db),
+):
+    """Scan several images at once; with merge=1 they are treated as pages of one receipt."""
+    trip_id, currency = await run_in_threadpool(_authorize_scan, access_token, request, db)
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many images. Maximum is {MAX_BATCH_FILES}.")
+
+    # Read everything up front so a bad image is reported without scanning the rest twice
+    images: list[bytes | None] = []
+    errors: list[str | None] = []
+    total = 0
+    for file in files:
+        try:
+            image_bytes = await _read_image(file)
+        except HTTPException as e:
+            images.append(None)
+            errors.append(e.detail)
+            continue
+        total += len(image_bytes)
+        if total > MAX_BATCH_SIZE:
+            raise _batch_too_large()
+        images.append(image_bytes)
+        errors.append(None)
+
+    language = _parse_language(accept_language)
     try:
         extractor = get_receipt_extractor()
-        result = await extractor.extract(image_bytes, file.content_type, language=language, fallback_currency=trip.currency)
     except ValueError as e:
         logger.error(f"Receipt extraction config error: {e}")
         raise HTTPException(status_code=503, detail="Receipt scanning is not available")
-    except Exception as e:
-        logger.error(f"Receipt extraction failed: {e}", exc_info=True)
-        raise HTTPException(status_code=502, detail="Failed to extract receipt data. Please try again.")
+    slots = asyncio.Semaphore(BATCH_SCAN_CONCURRENCY)
+
+    async def extract(file: UploadFile, image_bytes: bytes) -> ReceiptExtractionResult:
+        async with slots:
+            with track_scan(extractor, language, len(image_bytes), endpoint="batch", trip_id=trip_id):
+                return await extractor.extract(image_bytes, file.content_type, language=language, fallback_currency=currency)
+
+    outcomes = await asyncio.gather(
+        *(extract(file, image) for file, image in zip(files, images) if image is not None),
+        return_exceptions=True,
+    )
+
+    results: list[ReceiptExtractionResult | None] = []
+    pending = iter(outcomes)
+    for i, image in enumerate(images):
+        outcome = next(pending) if image is not None else None
+        if isinstance(outcome, ValueError):
+            logger.error(f"Receipt extraction config error: {outcome}")
+            errors[i] = "Receipt scanning is not available"
+            outcome = None
+        elif isinstance(outcome, Exception):
+            logger.error(f"Receipt extraction failed: {outcome}", exc_info=outcome)
+            errors[i] = "Failed to extract receipt data. Please try again."
+            outcome = None
+        results.append(outcome)
 
+    scanned = [r for r in results if r is not None]
     logger.info(
-        "Receipt scanned",
-        extra={"extra_data": {"trip_id": trip.id, "items_count": len(result.line_items)}},
+        "Receipts batch scanned",
+        extra={"extra_data": {"trip_id": trip_id, "images": len(files), "failed": len(files) - len(scanned), "merged": merge}},
     )
 
-    return _serialize_result(result)
+    return {
+        "results": [
+            {"filename": file.filename, "result": _serialize_result(r) if r else None, "error": err}
+            for file, r, err in zip(files, results, errors)
+        ],
+        "merged": _serialize_result(merge_pages(scanned)) if merge and scanned else None,
+    }
+
+
+router.include_router(batch_router)
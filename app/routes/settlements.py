@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Settlement, Member
 from app.deps import get_trip_by_token, verify_creator
+from app.ledger import record_settlement, revert_settlement
 from app.schemas import SettlementIn
 from app.serializers import serialize_settlement
 
@@ -44,6 +45,8 @@ def add_settlement(
         currency=data.currency,
     )
     db.add(settlement)
+    db.flush()
+    record_settlement(db, trip, serialize_settlement(settlement))
     trip.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(settlement)
@@ -67,6 +70,7 @@ def delete_settlement(
     if not settlement:
         raise HTTPException(status_code=404, detail="Settlement not found")
 
+    revert_settlement(db, trip, serialize_settlement(settlement))
     db.delete(settlement)
     trip.updated_at = datetime.utcnow()
     db.commit()
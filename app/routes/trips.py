@@ -2,17 +2,20 @@ import hashlib
 import logging
 from datetime import datetime
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
+from app.conditional import cache_headers, etag_matches, make_etag, not_modified
 from app.database import get_db
 from app.email import send_trip_link
-from app.models import Trip, Member, UserTrip
-from app.deps import generate_access_token, get_trip_by_token, get_or_create_user, verify_creator
+from app.models import Trip, Member, User, UserTrip
+from app.deps import generate_access_token, get_current_user, get_trip_aggregate, get_trip_by_token, get_or_create_user, verify_creator
 from app.exchange import SUPPORTED_CURRENCIES
+from app.ledger import rebuild_trip_balances
 from app.ratelimit import limiter
 from app.schemas import CreateTripIn, UpdateTripIn
 from app.serializers import serialize_trip
+from app.trip_cache import build_snapshot, render_snapshot, trip_snapshots
 
 logger = logging.getLogger("yoyo")
 
@@ -66,7 +69,7 @@ def create_trip(request: Request, data: CreateTripIn, background_tasks: Backgrou
         trip.creator_member_id = creator_member.id
         if user:
             creator_member.user_id = user.id
-            user.name = data.creator_name
+            db.get(User, user.id).name = data.creator_name
 
     db.commit()
     db.refresh(trip)
@@ -96,12 +99,18 @@ def get_trip(
     user = get_or_create_user(request, db)
     user_id = user.id if user else None
 
+    # Reads dominate writes: only load and serialize the full graph on a miss
+    snapshot = trip_snapshots.get(trip.id, trip.updated_at)
+
     # Determine creator status
-    is_creator = False
-    if user_id and trip.creator_member_id:
-        creator_member = db.query(Member).filter(Member.id == trip.creator_member_id).first()
-        if creator_member and creator_member.user_id == user_id:
-            is_creator = True
+    if snapshot is not None:
+        is_creator = user_id is not None and snapshot.creator_user_id == user_id
+    else:
+        is_creator = False
+        if user_id and trip.creator_member_id:
+            creator_member = db.query(Member).filter(Member.id == trip.creator_member_id).first()
+            if creator_member and creator_member.user_id == user_id:
+                is_creator = True
 
     # Password protection: non-creators must provide correct password
     if trip.password_hash and not is_creator:
@@ -111,11 +120,26 @@ def get_trip(
                 detail={"message": "Password required", "password_protected": True},
             )
 
+    # The payload only varies with the trip version and the per-user fields
+    etag = make_etag("trip", trip.id, trip.updated_at.isoformat(), user_id)
+    if etag_matches(request, etag):
+        response = not_modified(etag)
+    else:
+        if snapshot is None:
+            trip = get_trip_aggregate(access_token, db)
+            snapshot = build_snapshot(trip)
+            trip_snapshots.put(trip.id, trip.updated_at, snapshot)
+        response = Response(
+            content=render_snapshot(snapshot, user_id),
+            media_type="application/json",
+            headers=cache_headers(etag),
+        )
+
     # Record user-trip association for "Your trips" on homepage
     if user:
         _record_trip_visit(user.id, trip.id, db)
 
-    return serialize_trip(trip, is_creator=is_creator, user_id=user_id)
+    return response
 
 
 @router.patch("/trips/{access_token}")
@@ -125,7 +149,7 @@ def update_trip(
     request: Request,
     db: Session = Depends(get_db),
 ):
-    trip = get_trip_by_token(access_token, db)
+    trip = get_trip_aggregate(access_token, db)
     verify_creator(trip, request, db)
 
     if data.name is not None:
@@ -137,8 +161,10 @@ def update_trip(
         c = data.currency
         if c is not None and c not in SUPPORTED_CURRENCIES:
             raise HTTPException(status_code=400, detail="Unsupported currency")
-        if c is not None:
+        if c is not None and c != trip.currency:
             trip.currency = c
+            # Expenses/settlements without a currency follow the trip's
+            rebuild_trip_balances(db, trip)
 
     # settlement_currency: use UNSET sentinel to distinguish null (clear) from absent
     if "settlement_currency" in raw:
@@ -160,8 +186,8 @@ def update_trip(
 
     trip.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(trip)
-    user = getattr(request.state, "user", None)
+    trip = get_trip_aggregate(access_token, db)
+    user = get_current_user(request, db)
     return serialize_trip(trip, is_creator=True, user_id=user.id if user else None)
 
 
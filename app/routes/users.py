@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from app.database import get_db
+from app.deps import get_current_user
 from app.models import Trip, UserTrip
 from app.serializers import serialize_trip_summary
 
@@ -9,8 +10,8 @@ router = APIRouter()
 
 
 @router.get("/me")
-def get_me(request: Request):
-    user = request.state.user
+def get_me(request: Request, db: Session = Depends(get_db)):
+    user = get_current_user(request, db)
     if not user:
         return None
     return {"id": user.id, "name": user.name}
@@ -18,11 +19,12 @@ def get_me(request: Request):
 
 @router.get("/me/trips")
 def get_my_trips(request: Request, db: Session = Depends(get_db)):
-    user = request.state.user
+    user = get_current_user(request, db)
     if not user:
         return []
     trips = (
         db.query(Trip)
+        .options(selectinload(Trip.members))  # memberCount without a query per trip
         .join(UserTrip, UserTrip.trip_id == Trip.id)
         .filter(UserTrip.user_id == user.id, Trip.is_deleted == False)  # noqa: E712
         .order_by(UserTrip.last_visited_at.desc())
@@ -33,7 +35,7 @@ def get_my_trips(request: Request, db: Session = Depends(get_db)):
 
 @router.delete("/me/trips/{access_token}", status_code=204)
 def leave_trip(access_token: str, request: Request, db: Session = Depends(get_db)):
-    user = request.state.user
+    user = get_current_user(request, db)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     trip = db.query(Trip).filter(Trip.access_token == access_token).first()
@@ -50,6 +50,17 @@ class ExpenseIn(BaseModel):
     currency: str | None = None
 
 
+# --- Receipts ---
+
+class ScanExpenseIn(BaseModel):
+    paid_by: str
+    involved_members: list[str] = Field(min_length=1)  # share the whole bill, or the unassigned items
+    item_members: dict[int, list[str]] | None = None  # line item index -> member ids; None = split evenly
+    description: str | None = None  # defaults to the scanned title
+    date: str | None = None  # defaults to today
+    currency: str | None = None  # defaults to the receipt's currency, then the trip's
+
+
 # --- Settlements ---
 
 class SettlementIn(BaseModel):
@@ -1,4 +1,5 @@
 from app.models import Trip, Expense, Settlement
+from app.timing import phase
 
 
 def serialize_member(member) -> dict:
@@ -55,6 +56,7 @@ def serialize_trip_summary(trip: Trip) -> dict:
     }
 
 
+@phase("serialize")
 def serialize_trip(trip: Trip, is_creator: bool = False, user_id: int | None = None) -> dict:
     your_member_id = None
     if user_id:
@@ -0,0 +1,152 @@
+"""Slow-query log with EXPLAIN capture.
+
+Every statement slower than SLOW_QUERY_MS (0 disables) is logged with its
+SQL template, the types of its parameters (never the values), its duration
+and the route that issued it. The plan comes from EXPLAIN QUERY PLAN on
+SQLite and EXPLAIN (no ANALYZE, so nothing runs twice) on Postgres. It is
+captured on a separate connection by a single background thread, so the
+slow request isn't held up any longer. Each statement fingerprint is logged
+at most once per SLOW_QUERY_LOG_INTERVAL seconds; later lines report how
+many occurrences were skipped in between.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import route_label
+from app.timing import current
+
+logger = logging.getLogger("yoyo")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() != "false"
+SLOW_QUERY_LOG_INTERVAL = float(os.getenv("SLOW_QUERY_LOG_INTERVAL", "300"))
+SLOW_QUERY_MAX_FINGERPRINTS = 10000
+
+_EXPLAIN_PREFIX = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# "IN (?, ?, ?)" and "IN (%(p_1)s, %(p_2)s)" vary with the list length
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+_last_logged: dict[str, tuple[float, int]] = {}  # fingerprint -> (monotonic time, skipped since)
+_lock = threading.Lock()
+
+
+def normalize(statement: str) -> str:
+    """Collapse whitespace and placeholder lists so equivalent SQL compares equal."""
+    return _PLACEHOLDER_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def fingerprint(template: str) -> str:
+    return hashlib.sha1(template.encode()).hexdigest()[:12]
+
+
+def _parameter_rows(parameters, executemany: bool) -> list | None:
+    # Batched "insertmanyvalues" INSERTs report executemany with one flat row
+    if executemany and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        return list(parameters)
+    return None
+
+
+def parameter_shape(parameters, executemany: bool) -> object:
+    """Describe parameters by type only, e.g. {"id": "int"} or ["str", "int"]."""
+    rows = _parameter_rows(parameters, executemany)
+    if rows is not None:
+        return {"rows": len(rows), "row": parameter_shape(rows[0], False)}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _should_log(key: str) -> int | None:
+    """Return the skipped count to report, or None while rate-limited."""
+    now = time.monotonic()
+    with _lock:
+        last, skipped = _last_logged.get(key, (None, 0))
+        if last is not None and now - last < SLOW_QUERY_LOG_INTERVAL:
+            _last_logged[key] = (last, skipped + 1)
+            return None
+        if len(_last_logged) >= SLOW_QUERY_MAX_FINGERPRINTS:
+            _last_logged.clear()
+        _last_logged[key] = (now, 0)
+        return skipped
+
+
+def _explain(engine: Engine, statement: str, parameters) -> list[str] | None:
+    prefix = _EXPLAIN_PREFIX.get(engine.dialect.name)
+    if not SLOW_QUERY_EXPLAIN or prefix is None or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    try:
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(prefix + statement, parameters or ()).fetchall()
+            conn.rollback()
+    except Exception as e:
+        return [f"EXPLAIN failed: {type(e).__name__}: {e}"]
+    # SQLite rows are (id, parent, notused, detail); Postgres rows are one text column
+    return [str(row[-1]) for row in rows]
+
+
+def _report(engine: Engine, statement: str, parameters, executemany: bool, fields: dict) -> None:
+    rows = _parameter_rows(parameters, executemany)
+    plan_parameters = rows[0] if rows else parameters
+    fields["plan"] = _explain(engine, statement, plan_parameters)
+    logger.warning("Slow query", extra={"extra_data": fields})
+
+
+def install_slow_query_log(engine: Engine) -> None:
+    """Register the cursor events unless SLOW_QUERY_MS is 0."""
+    if SLOW_QUERY_MS <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        starts = context.connection.info.get("slow_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("slow_query_start")
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        if duration_ms < SLOW_QUERY_MS or statement.startswith("EXPLAIN"):
+            return
+        template = normalize(statement)
+        key = fingerprint(template)
+        skipped = _should_log(key)
+        if skipped is None:
+            return
+        timing = current()
+        scope = timing.scope if timing else None
+        fields = {
+            "fingerprint": key,
+            "statement": template[:4000],
+            "parameters": parameter_shape(parameters, executemany),
+            "duration_ms": round(duration_ms, 1),
+            "method": scope["method"] if scope else None,
+            "route": route_label(scope) if scope else None,
+            "skipped": skipped,
+        }
+        try:
+            _executor.submit(_report, engine, statement, parameters, executemany, fields)
+        except RuntimeError:
+            pass  # interpreter shutting down
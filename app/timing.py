@@ -0,0 +1,101 @@
+"""Per-request timing: database queries plus named phases.
+
+RequestLoggingMiddleware puts a RequestTiming in a context variable for
+each request. Cursor events on the engine count queries and add up their
+time, and phase() blocks add time under a name (exchange-fetch, serialize,
+balance-compute). Worker threads started with run_in_threadpool or
+asyncio.to_thread copy the context, so they update the same record. Work
+outside a request, like the rate refresher and scan worker, is not tracked.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from starlette.types import Scope
+
+from app.database import engine
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+_current: ContextVar["RequestTiming | None"] = ContextVar("request_timing", default=None)
+
+
+@dataclass
+class RequestTiming:
+    scope: Scope | None = None  # the request's ASGI scope, for labelling
+    queries: int = 0
+    db_ms: float = 0.0
+    phases: dict[str, float] = field(default_factory=dict)  # name -> ms
+    _active: set[str] = field(default_factory=set)
+
+    def server_timing(self, total_ms: float) -> str:
+        """Render a Server-Timing header value."""
+        entries = [f'db;dur={self.db_ms:.1f};desc="{self.queries} queries"']
+        entries += [f"{name};dur={ms:.1f}" for name, ms in self.phases.items()]
+        entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+
+def current() -> RequestTiming | None:
+    """The record for the request running in this context, if any."""
+    return _current.get()
+
+
+@contextmanager
+def track_request(scope: Scope | None = None):
+    """Collect timing for everything run inside the block."""
+    timing = RequestTiming(scope)
+    token = _current.set(timing)
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name: str):
+    """Add the block's wall time to the current request's `name` phase.
+
+    Nested blocks with the same name are only counted once, so a helper can be
+    timed both on its own and inside a larger phase.
+    """
+    timing = _current.get()
+    if timing is None or name in timing._active:
+        yield
+        return
+    timing._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing._active.discard(name)
+        elapsed = (time.perf_counter() - start) * 1000
+        timing.phases[name] = timing.phases.get(name, 0.0) + elapsed
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timing = _current.get()
+    starts = conn.info.get("query_start")
+    if timing is None or not starts:
+        return
+    timing.queries += 1
+    timing.db_ms += (time.perf_counter() - starts.pop()) * 1000
+
+
+@event.listens_for(engine, "handle_error")
+def _on_cursor_error(context):
+    # after_cursor_execute doesn't fire for a failed statement
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
@@ -0,0 +1,111 @@
+"""In-process cache of encoded GET /trips/{access_token} payloads.
+
+Entries are keyed by (trip.id, trip.updated_at), so any write that bumps
+updated_at makes the old snapshot unreachable; the attribute listener below
+also drops it eagerly to free memory. The per-user fields (is_creator,
+your_member_id) are kept out of the cached bytes and appended on each read.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import event
+
+from app.models import Trip
+from app.serializers import serialize_trip
+from app.timing import phase
+
+TRIP_CACHE_MAX_BYTES = int(os.getenv("TRIP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class TripSnapshot(NamedTuple):
+    body: bytes  # encoded trip JSON without the closing brace or per-user fields
+    creator_user_id: int | None
+    member_by_user: dict[int, str]  # user_id -> member id claimed in this trip
+
+
+def _encode(content: dict) -> bytes:
+    # Same encoding as Starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+@phase("serialize")
+def build_snapshot(trip: Trip) -> TripSnapshot:
+    """Serialize a fully loaded trip into a cacheable snapshot."""
+    content = serialize_trip(trip)
+    del content["is_creator"], content["your_member_id"]
+    member_by_user: dict[int, str] = {}
+    creator_user_id = None
+    for m in trip.members:
+        if m.user_id is not None:
+            member_by_user.setdefault(m.user_id, str(m.id))
+        if m.id == trip.creator_member_id:
+            creator_user_id = m.user_id
+    return TripSnapshot(_encode(content)[:-1], creator_user_id, member_by_user)
+
+
+@phase("serialize")
+def render_snapshot(snapshot: TripSnapshot, user_id: int | None) -> bytes:
+    """Append the per-user fields to a cached snapshot body."""
+    is_creator = user_id is not None and snapshot.creator_user_id == user_id
+    your_member_id = snapshot.member_by_user.get(user_id) if user_id else None
+    return snapshot.body + b',' + _encode({"is_creator": is_creator, "your_member_id": your_member_id})[1:]
+
+
+class TripSnapshotCache:
+    """Thread-safe LRU of trip snapshots bounded by total body size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[datetime, TripSnapshot]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, trip_id: int, updated_at: datetime) -> TripSnapshot | None:
+        with self._lock:
+            entry = self._entries.get(trip_id)
+            if entry is None or entry[0] != updated_at:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(trip_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, trip_id: int, updated_at: datetime, snapshot: TripSnapshot) -> None:
+        if len(snapshot.body) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(trip_id)
+            self._entries[trip_id] = (updated_at, snapshot)
+            self.size += len(snapshot.body)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, trip_id: int) -> None:
+        with self._lock:
+            self._pop(trip_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _pop(self, trip_id: int) -> None:
+        entry = self._entries.pop(trip_id, None)
+        if entry is not None:
+            self.size -= len(entry[1].body)
+
+
+trip_snapshots = TripSnapshotCache(TRIP_CACHE_MAX_BYTES)
+
+
+@event.listens_for(Trip.updated_at, "set")
+def _invalidate_on_touch(target, value, oldvalue, initiator):
+    if target.id is not None:
+        trip_snapshots.invalidate(target.id)
@@ -0,0 +1,74 @@
+"""In-process cache of ctk -> user identity.
+
+Almost every request carries a ctk cookie, and the user it maps to only
+changes when a trip creator sets their name. Entries expire after
+USER_CACHE_TTL_SECONDS so other worker processes converge; the attribute
+listener below drops an entry as soon as this process renames a user.
+Unknown ctks are not cached, since another worker may create the user.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from sqlalchemy import event
+
+from app.models import User
+
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+
+
+class CachedUser(NamedTuple):
+    id: int
+    name: str | None
+
+
+class UserCache:
+    """Thread-safe LRU of ctk -> CachedUser with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, CachedUser]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ctk: str) -> CachedUser | None:
+        with self._lock:
+            entry = self._entries.get(ctk)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(ctk)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, ctk: str, user: CachedUser) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(ctk, None)
+            self._entries[ctk] = (time.monotonic() + self.ttl, user)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, ctk: str) -> None:
+        with self._lock:
+            self._entries.pop(ctk, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(User.name, "set")
+def _invalidate_on_rename(target, value, oldvalue, initiator):
+    if target.ctk is not None:
+        user_cache.invalidate(target.ctk)
@@ -0,0 +1,123 @@
+"""Requests/sec through the full middleware stack, without any network.
+
+Calls the ASGI app directly so the numbers reflect server-side overhead
+only. Run it on two checkouts to compare middleware changes:
+
+    python scripts/bench_middleware.py --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight at once")
+    return parser.parse_args()
+
+
+async def request(app, path: str, cookie: str | None) -> int:
+    headers = [(b"host", b"localhost")]
+    if cookie:
+        headers.append((b"cookie", f"ctk={cookie}".encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+    status = 0
+    sent_request = False
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # never disconnects
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, path: str, cookie: str | None, total: int, concurrency: int) -> tuple[float, int]:
+    slots = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one() -> None:
+        nonlocal errors
+        async with slots:
+            if await request(app, path, cookie) != 200:
+                errors += 1
+
+    await request(app, path, cookie)  # first visit creates the user_trips row
+    await asyncio.gather(*(one() for _ in range(min(total, 200))))  # warm-up
+    errors = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start), errors
+
+
+async def run(args: argparse.Namespace) -> None:
+    from app.database import SessionLocal
+    from app.deps import generate_access_token
+    from app.main import app
+    from app.models import Member, Trip, User
+
+    # Keep per-request log lines out of the measurement
+    logging.getLogger("yoyo").setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    trip = Trip(access_token=generate_access_token(), name="Benchmark", currency="USD")
+    db.add(trip)
+    db.flush()
+    user = User(ctk="bench-ctk", name="Ann")
+    db.add(user)
+    db.flush()
+    db.add_all([Member(trip_id=trip.id, name=name, user_id=user.id if name == "Ann" else None) for name in ("Ann", "Bob", "Cy")])
+    db.commit()
+    token = trip.access_token
+    db.close()
+
+    cases = [
+        ("/health", None),
+        (f"/api/trips/{token}", "bench-ctk"),
+        (f"/api/trips/{token}", None),
+    ]
+    for path, cookie in cases:
+        rps, errors = await measure(app, path, cookie, args.requests, args.concurrency)
+        label = f"GET {path.replace(token, '{token}')} ({'with' if cookie else 'no'} ctk)"
+        print(f"{label:40} {rps:8.0f} req/s  ({errors} errors)")
+
+
+def main() -> None:
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="yoyo-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    os.environ["EXCHANGE_REFRESH_INTERVAL"] = "0"
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
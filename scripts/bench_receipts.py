@@ -0,0 +1,130 @@
+"""Load benchmark for the receipt scanning endpoints.
+
+Drives the app in-process (no network, no OpenAI) with the fake provider and
+concurrent uploads, then reports latency percentiles and peak RSS. Toggle
+stages to measure them on their own, e.g.:
+
+    python scripts/bench_receipts.py --latency-ms 0 --no-preprocess --no-cache  # upload path only
+    python scripts/bench_receipts.py --latency-ms 0 --no-cache                  # + preprocessing
+    python scripts/bench_receipts.py --unique 5                                 # mostly cache hits
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="total requests to send")
+    parser.add_argument("--concurrency", type=int, default=20, help="requests in flight at once")
+    parser.add_argument("--unique", type=int, default=20, help="distinct images (fewer means more cache hits)")
+    parser.add_argument("--size", type=int, default=3000, help="long edge of generated images in px")
+    parser.add_argument("--latency-ms", type=float, default=800, help="simulated provider latency")
+    parser.add_argument("--endpoint", choices=["single", "batch"], default="single")
+    parser.add_argument("--batch-size", type=int, default=3, help="images per batch request")
+    parser.add_argument("--no-preprocess", action="store_true", help="skip downscale/recompress")
+    parser.add_argument("--no-cache", action="store_true", help="skip the content-hash result cache")
+    return parser.parse_args()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def make_images(count: int, size: int) -> list[bytes]:
+    from PIL import Image
+
+    images = []
+    for _ in range(count):
+        img = Image.effect_noise((size * 3 // 4, size), 40).convert("RGB")
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=90)
+        images.append(out.getvalue())
+    return images
+
+
+async def run(args: argparse.Namespace) -> None:
+    import httpx
+
+    from app.database import SessionLocal
+    from app.deps import generate_access_token
+    from app.main import app
+    from app.models import Trip
+
+    # Per-request INFO logs would drown the report and skew timings
+    logging.getLogger("yoyo").setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    trip = Trip(access_token=generate_access_token(), name="Benchmark", currency="USD")
+    db.add(trip)
+    db.commit()
+    token = trip.access_token
+    db.close()
+
+    images = make_images(args.unique, args.size)
+    rss_before = peak_rss_mb()
+    path = f"/api/trips/{token}/scan-receipt" if args.endpoint == "single" else f"/api/trips/{token}/scan-receipts"
+    field = "file" if args.endpoint == "single" else "files"
+    per_request = 1 if args.endpoint == "single" else args.batch_size
+
+    latencies: list[float] = []
+    errors = 0
+    slots = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i: int) -> None:
+            nonlocal errors
+            files = [
+                (field, (f"r{i}-{j}.jpg", images[(i * per_request + j) % len(images)], "image/jpeg"))
+                for j in range(per_request)
+            ]
+            async with slots:
+                start = time.perf_counter()
+                response = await client.post(path, files=files)
+                latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    p = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"endpoint      {args.endpoint} ({per_request} image(s)/request)")
+    print(f"stages        preprocess={'off' if args.no_preprocess else 'on'} cache={'off' if args.no_cache else 'on'} "
+          f"provider latency={args.latency_ms:g}ms")
+    print(f"images        {args.unique} unique, avg {sum(map(len, images)) / len(images) / 1024:.0f} KB")
+    print(f"requests      {args.requests} ({errors} errors) at concurrency {args.concurrency}")
+    print(f"throughput    {args.requests / elapsed:.1f} req/s")
+    print(f"latency ms    p50 {p[49]:.1f}  p95 {p[94]:.1f}  p99 {p[98]:.1f}  max {max(latencies):.1f}")
+    print(f"peak RSS      {peak_rss_mb():.1f} MB (after image generation: {rss_before:.1f} MB)")
+
+
+def main() -> None:
+    args = parse_args()
+    # Configure the app before it is imported
+    workdir = tempfile.mkdtemp(prefix="yoyo-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    os.environ["RECEIPT_PROVIDER"] = "fake"
+    os.environ["RECEIPT_FAKE_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["RECEIPT_PREPROCESS_ENABLED"] = "false" if args.no_preprocess else "true"
+    os.environ["RECEIPT_CACHE_ENABLED"] = "false" if args.no_cache else "true"
+    os.environ["EXCHANGE_REFRESH_INTERVAL"] = "0"
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import re
+import tempfile
+
+# Configure the app before anything imports it: a throwaway SQLite database,
+# no background workers, no real upstream, and per-request Server-Timing.
+_tmpdir = tempfile.mkdtemp(prefix="yoyo-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/test.db"
+os.environ["EXCHANGE_API_BASE"] = "http://127.0.0.1:9/latest"
+os.environ["EXCHANGE_REFRESH_INTERVAL"] = "0"
+os.environ["SCAN_JOB_CONCURRENCY"] = "0"
+os.environ["SERVER_TIMING_ENABLED"] = "true"
+os.environ["SLOW_QUERY_MS"] = "0"
+os.environ["LOG_ASYNC"] = "false"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import exchange  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import ExchangeRate  # noqa: E402
+from tests.fake_rate_server import FakeRateServer  # noqa: E402
+
+_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+@pytest.fixture
+def client():
+    # localhost gets a plain (not Secure, no domain) ctk cookie, so it sticks
+    with TestClient(app, base_url="http://localhost") as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def _rate_server():
+    server = FakeRateServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def rate_server(_rate_server, monkeypatch):
+    """Point the exchange module at the fake upstream, with no rates on record."""
+    monkeypatch.setattr(exchange, "EXCHANGE_API_BASE", _rate_server.url)
+    _rate_server.requests.clear()
+    _rate_server.delay, _rate_server.failing = 0.0, False
+    exchange.rate_cache.clear()
+    exchange.rate_breaker.record_success()
+    with SessionLocal() as db:
+        db.query(ExchangeRate).delete()
+        db.commit()
+    yield _rate_server
+    exchange.rate_cache.clear()
+    exchange.rate_breaker.record_success()
+
+
+def query_count(response) -> int:
+    """Queries the request ran, from the Server-Timing header."""
+    match = _QUERIES.search(response.headers["server-timing"])
+    assert match, response.headers["server-timing"]
+    return int(match.group(1))
+
+
+def create_trip(client, members=("Ann", "Bob", "Cid"), currency="USD") -> dict:
+    response = client.post("/api/trips", json={
+        "name": "Lisbon",
+        "currency": currency,
+        "members": list(members),
+        "creator_name": members[0],
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["trip"]
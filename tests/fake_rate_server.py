@@ -0,0 +1,78 @@
+"""An in-process stand-in for open.er-api.com's /latest/{base} endpoint."""
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.exchange import SUPPORTED_CURRENCIES
+
+RATE_TIME = 1790812800  # 2026-10-01 00:00 UTC
+
+
+def rates_for(base: str) -> dict[str, float]:
+    """Deterministic quotes: 1 base = rates[c] c."""
+    weight = {c: 1 + i / 7 for i, c in enumerate(SUPPORTED_CURRENCIES)}
+    return {c: weight[c] / weight[base] for c in SUPPORTED_CURRENCIES}
+
+
+class FakeRateServer:
+    """Serves rates on a background thread and counts requests per base.
+
+    Set `delay` to hold each response open (to line up concurrent misses) or
+    `failing` to answer 503 like an upstream outage.
+    """
+
+    def __init__(self):
+        self.requests: Counter = Counter()
+        self.delay = 0.0
+        self.failing = False
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                base = self.path.rstrip("/").rsplit("/", 1)[-1]
+                with server._lock:
+                    server.requests[base] += 1
+                time.sleep(server.delay)
+                if server.failing or base not in SUPPORTED_CURRENCIES:
+                    self.send_error(503 if server.failing else 404)
+                    return
+                body = json.dumps({
+                    "result": "success",
+                    "base_code": base,
+                    "time_last_update_unix": RATE_TIME,
+                    "rates": rates_for(base),
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-rate-server", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/v6/latest"
+
+    @property
+    def total_requests(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def start(self) -> "FakeRateServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
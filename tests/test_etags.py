@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+from app import exchange
+from app.database import SessionLocal
+from app.models import ExchangeRate
+from tests.conftest import create_trip
+
+# More digits than the Numeric(18, 8) column keeps
+UPSTREAM_RATES = {"CHF": 1.0, "SEK": 11.912345678912, "NOK": 12.3456789123}
+
+
+@pytest.fixture
+def cold_rates(monkeypatch):
+    """Empty rate caches and an upstream that returns full-precision floats."""
+    async def fetch_latest_async(base):
+        return dict(UPSTREAM_RATES), date(2026, 10, 1)
+
+    monkeypatch.setattr(exchange, "_fetch_latest_async", fetch_latest_async)
+    exchange.rate_cache.clear()
+    with SessionLocal() as db:
+        db.query(ExchangeRate).filter(ExchangeRate.base_currency == "CHF").delete()
+        db.commit()
+    yield
+    exchange.rate_cache.clear()
+
+
+def add_sek_expense(client, trip: dict) -> None:
+    member_ids = [m["id"] for m in trip["members"]]
+    response = client.post(f"/api/trips/{trip['access_token']}/expenses", json={
+        "description": "Ferry",
+        "amount": 5000,
+        "paid_by": member_ids[0],
+        "date": "2026-10-01",
+        "split_method": "even",
+        "involved_members": member_ids,
+        "currency": "SEK",
+    })
+    assert response.status_code == 201, response.text
+
+
+@pytest.mark.parametrize("path", ["/balances", "/exchange-rates?target=CHF"])
+def test_repeat_request_after_cold_fetch_is_not_modified(client, cold_rates, path):
+    trip = create_trip(client, currency="CHF")
+    add_sek_expense(client, trip)
+    url = f"/api/trips/{trip['access_token']}{path}"
+
+    first = client.get(url)
+    assert first.status_code == 200, first.text
+    # The second request reads the rounded rates back from the cache
+    second = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_etag_changes_with_trip(client, cold_rates):
+    trip = create_trip(client, currency="CHF")
+    add_sek_expense(client, trip)
+    url = f"/api/trips/{trip['access_token']}/balances"
+
+    etag = client.get(url).headers["etag"]
+    add_sek_expense(client, trip)
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
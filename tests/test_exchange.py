@@ -0,0 +1,46 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from app import exchange
+from app.database import SessionLocal
+from app.models import ExchangeRate
+
+# More digits than the Numeric(18, 8) column keeps
+UPSTREAM_RATES = {"NZD": 1.0, "USD": 0.591234567891, "EUR": 0.5412345678912}
+
+
+@pytest.fixture
+def db():
+    exchange.rate_cache.clear()
+    with SessionLocal() as db:
+        db.query(ExchangeRate).filter(ExchangeRate.base_currency == "NZD").delete()
+        db.commit()
+        yield db
+    exchange.rate_cache.clear()
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    async def fetch_latest_async(base):
+        return dict(UPSTREAM_RATES), date(2026, 10, 1)
+
+    monkeypatch.setattr(exchange, "_fetch_latest", lambda base: (dict(UPSTREAM_RATES), date(2026, 10, 1)))
+    monkeypatch.setattr(exchange, "_fetch_latest_async", fetch_latest_async)
+
+
+def test_fresh_fetch_returns_what_the_cache_serves(db, upstream):
+    fetched, _, _ = exchange.get_rates_for_currencies(db, "NZD", ["USD", "EUR"])
+    cached, _, _ = exchange.get_rates_for_currencies(db, "NZD", ["USD", "EUR"])
+    assert fetched == cached
+
+    exchange.rate_cache.clear()
+    from_table, _, _ = exchange.get_rates_for_currencies(db, "NZD", ["USD", "EUR"])
+    assert from_table == fetched
+
+
+def test_async_fresh_fetch_returns_what_the_cache_serves(db, upstream):
+    fetched, _, _ = asyncio.run(exchange.get_rates_for_currencies_async(db, "NZD", ["USD", "EUR"]))
+    cached, _, _ = asyncio.run(exchange.get_rates_for_currencies_async(db, "NZD", ["USD", "EUR"]))
+    assert fetched == cached
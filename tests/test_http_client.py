@@ -0,0 +1,21 @@
+import asyncio
+
+from app import http_client
+
+
+def test_async_client_from_a_previous_loop_is_closed():
+    async def client():
+        return http_client.get_async_client()
+
+    first = asyncio.run(client())
+
+    async def replace():
+        second = http_client.get_async_client()
+        await asyncio.sleep(0)  # let the scheduled aclose() run
+        return second
+
+    second = asyncio.run(replace())
+    assert second is not first
+    assert first.is_closed
+    assert not second.is_closed
+    asyncio.run(http_client.close_clients())
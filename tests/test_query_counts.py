@@ -0,0 +1,99 @@
+"""Query budgets for the hot read endpoints.
+
+Counts come from the per-request counter in app.timing (via Server-Timing).
+Each endpoint must run a fixed number of queries however many expenses,
+settlements or trips are involved.
+"""
+
+from tests.conftest import create_trip, query_count
+
+
+def add_expense(client, trip: dict, amount: int = 1200, split_method: str = "even") -> None:
+    member_ids = [m["id"] for m in trip["members"]]
+    response = client.post(f"/api/trips/{trip['access_token']}/expenses", json={
+        "description": "Dinner",
+        "amount": amount,
+        "paid_by": member_ids[0],
+        "date": "2026-10-01",
+        "split_method": split_method,
+        "involved_members": member_ids,
+    })
+    assert response.status_code == 201, response.text
+
+
+def add_settlement(client, trip: dict, amount: int = 300) -> None:
+    member_ids = [m["id"] for m in trip["members"]]
+    response = client.post(f"/api/trips/{trip['access_token']}/settlements", json={
+        "from": member_ids[1],
+        "to": member_ids[0],
+        "amount": amount,
+        "date": "2026-10-02",
+    })
+    assert response.status_code == 201, response.text
+
+
+def warm_user(client) -> None:
+    # Creating a trip renames the user, which evicts them from the user cache
+    assert client.get("/api/me").status_code == 200
+
+
+def get_queries(client, path: str) -> int:
+    response = client.get(path)
+    assert response.status_code == 200, response.text
+    return query_count(response)
+
+
+def test_get_trip_queries_do_not_grow_with_expenses(client):
+    trip = create_trip(client)
+    path = f"/api/trips/{trip['access_token']}"
+
+    add_expense(client, trip)
+    warm_user(client)
+    cold_small = get_queries(client, path)
+    warm = get_queries(client, path)
+
+    for amount in range(100, 600, 100):
+        add_expense(client, trip, amount)
+    add_settlement(client, trip)
+    warm_user(client)
+    cold_large = get_queries(client, path)
+
+    assert cold_large == cold_small
+    assert cold_small <= 9
+    # Snapshot hit: token lookup plus recording the visit
+    assert warm <= 3
+
+
+def test_balances_queries_do_not_grow_with_expenses(client):
+    trip = create_trip(client)
+    path = f"/api/trips/{trip['access_token']}/balances"
+
+    add_expense(client, trip)
+    warm_user(client)
+    small = get_queries(client, path)
+
+    for amount in range(100, 600, 100):
+        add_expense(client, trip, amount, split_method="even")
+    add_settlement(client, trip)
+    warm_user(client)
+    large = get_queries(client, path)
+
+    # Members, ledger rows, nothing per expense
+    assert large == small
+    assert small <= 3
+
+
+def test_my_trips_queries_do_not_grow_with_trips(client):
+    create_trip(client)
+    warm_user(client)
+    one = get_queries(client, "/api/me/trips")
+
+    for _ in range(4):
+        create_trip(client)
+    warm_user(client)
+    response = client.get("/api/me/trips")
+    assert response.status_code == 200
+    assert len(response.json()) >= 5
+
+    assert query_count(response) == one
+    assert one <= 2
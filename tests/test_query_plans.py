@@ -0,0 +1,92 @@
+"""EXPLAIN QUERY PLAN checks for the hot lookups.
+
+Each test captures the SQL the app actually runs and asserts SQLite plans
+it with index SEARCHes, never a full-table SCAN. The tables are tiny, but
+without ANALYZE statistics the planner picks the same indexes it would on
+a large database.
+"""
+
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import exchange
+from app.database import SessionLocal, engine
+from tests.conftest import create_trip
+from tests.test_query_counts import add_expense, add_settlement
+
+
+@contextmanager
+def captured(table: str):
+    """Collect (statement, parameters) for every query reading `table`."""
+    statements = []
+    reads_table = re.compile(rf"\b(?:FROM|JOIN) {table}\b")
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT") and reads_table.search(statement):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+
+
+def query_plan(statement: str, parameters) -> list[str]:
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def assert_no_scans(statements) -> list[list[str]]:
+    assert statements, "no matching query was captured"
+    plans = [query_plan(statement, parameters) for statement, parameters in statements]
+    for plan in plans:
+        assert not [step for step in plan if step.startswith("SCAN")], plan
+    return plans
+
+
+def test_member_removal_settlement_check_uses_both_indexes(client):
+    trip = create_trip(client, members=("Ann", "Bob", "Cid", "Dee"))
+    add_settlement(client, trip)
+    member_id = trip["members"][3]["id"]
+
+    with captured("settlements") as statements:
+        response = client.delete(f"/api/trips/{trip['access_token']}/members/{member_id}")
+    assert response.status_code == 204, response.text
+
+    plans = assert_no_scans(statements)
+    # from_member_id = ? OR to_member_id = ? is answered from both indexes
+    assert any("MULTI-INDEX OR" in step for plan in plans for step in plan)
+
+
+def test_my_trips_searches_user_trips(client):
+    create_trip(client)
+
+    with captured("user_trips") as statements:
+        assert client.get("/api/me/trips").status_code == 200
+
+    plans = assert_no_scans(statements)
+    assert any(step.startswith("SEARCH user_trips") for plan in plans for step in plan)
+
+
+def test_trip_load_searches_expense_members(client):
+    trip = create_trip(client)
+    add_expense(client, trip)
+
+    with captured("expense_members") as statements:
+        assert client.get(f"/api/trips/{trip['access_token']}").status_code == 200
+
+    plans = assert_no_scans(statements)
+    assert any(step.startswith("SEARCH expense_members") for plan in plans for step in plan)
+
+
+def test_cached_rates_search_exchange_rates():
+    exchange.rate_cache.clear()
+    with SessionLocal() as db, captured("exchange_rates") as statements:
+        exchange._cached_rates(db, "USD", ["EUR", "GBP"])
+
+    plans = assert_no_scans(statements)
+    assert any(step.startswith("SEARCH exchange_rates") for plan in plans for step in plan)
@@ -0,0 +1,90 @@
+"""Concurrent cache misses for one base share a single upstream fetch."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+
+from app import exchange
+from app.database import SessionLocal, engine
+
+# Each caller holds a pooled connection while it waits, so stay under the
+# pool's 15 (5 + 10 overflow) to leave one for the fetch that stores rates
+CALLERS = 12
+
+
+@pytest.fixture
+def db_errors():
+    """Statements that failed (e.g. IntegrityError from racing inserts)."""
+    errors = []
+
+    def on_error(context):
+        errors.append(context.original_exception)
+
+    event.listen(engine, "handle_error", on_error)
+    yield errors
+    event.remove(engine, "handle_error", on_error)
+
+
+def test_concurrent_thread_misses_make_one_upstream_call(rate_server, db_errors):
+    rate_server.delay = 0.3  # keep the first fetch in flight while the rest arrive
+    start = threading.Barrier(CALLERS)
+
+    def lookup(_):
+        with SessionLocal() as db:
+            start.wait()
+            return exchange.get_rates_for_currencies(db, "EUR", ["USD", "GBP"])
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        results = list(pool.map(lookup, range(CALLERS)))
+
+    assert rate_server.requests["EUR"] == 1
+    assert all(result == results[0] for result in results)
+    assert not any(stale for _, _, stale in results)
+    assert db_errors == []
+
+
+def test_concurrent_async_misses_make_one_upstream_call(rate_server, db_errors):
+    rate_server.delay = 0.3
+
+    async def lookup():
+        # A session per caller, as each request has its own
+        with SessionLocal() as db:
+            return await exchange.get_rates_for_currencies_async(db, "EUR", ["USD", "GBP"])
+
+    async def lookups():
+        return await asyncio.gather(*(lookup() for _ in range(CALLERS)))
+
+    results = asyncio.run(lookups())
+
+    assert rate_server.requests["EUR"] == 1
+    assert all(result == results[0] for result in results)
+    assert db_errors == []
+
+
+def test_sync_and_async_misses_share_one_fetch(rate_server, db_errors):
+    rate_server.delay = 0.3
+    start = threading.Barrier(CALLERS)
+
+    def sync_lookup(_):
+        with SessionLocal() as db:
+            start.wait()
+            return exchange.get_rates_for_currencies(db, "EUR", ["USD", "GBP"])
+
+    async def async_lookup():
+        with SessionLocal() as db:
+            await asyncio.to_thread(start.wait)
+            return await exchange.get_rates_for_currencies_async(db, "EUR", ["USD", "GBP"])
+
+    async def lookups():
+        return await asyncio.gather(*(async_lookup() for _ in range(CALLERS // 2)))
+
+    with ThreadPoolExecutor(CALLERS // 2) as pool:
+        sync_results = pool.map(sync_lookup, range(CALLERS // 2))
+        results = asyncio.run(lookups()) + list(sync_results)
+
+    assert rate_server.requests["EUR"] == 1
+    assert all(result == results[0] for result in results)
+    assert db_errors == []
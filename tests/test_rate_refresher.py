@@ -0,0 +1,90 @@
+"""Background refresh, stale fallback and the circuit breaker, against the fake upstream."""
+
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import exchange
+from app.database import SessionLocal
+from app.models import ExchangeRate
+from tests.fake_rate_server import rates_for
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as db:
+        yield db
+
+
+def age_rates(db, hours: float) -> None:
+    db.query(ExchangeRate).update({ExchangeRate.fetched_at: datetime.utcnow() - timedelta(hours=hours)})
+    db.commit()
+    exchange.rate_cache.clear()
+
+
+def test_fake_server_serves_latest_rates(rate_server):
+    response = exchange.get_client().get(f"{rate_server.url}/EUR")
+    assert response.status_code == 200
+    assert response.json()["rates"] == rates_for("EUR")
+    assert rate_server.requests["EUR"] == 1
+
+
+def test_refresher_warms_every_base_once(rate_server, db):
+    exchange.refresh_stale_bases()
+    assert set(rate_server.requests) == set(exchange.SUPPORTED_CURRENCIES)
+    assert rate_server.total_requests == len(exchange.SUPPORTED_CURRENCIES)
+
+    # Everything is fresh now, so requests are served without going upstream
+    rates, rate_date, stale = exchange.get_rates_for_currencies(db, "USD", ["EUR", "JPY"])
+    assert rates["EUR"] == pytest.approx(1 / rates_for("USD")["EUR"])
+    assert rate_date == date(2026, 10, 1)
+    assert not stale
+
+    exchange.refresh_stale_bases()
+    assert rate_server.total_requests == len(exchange.SUPPORTED_CURRENCIES)
+
+
+def test_refresher_refetches_aging_bases(rate_server, db):
+    exchange.refresh_stale_bases()
+    age_rates(db, hours=13)
+    rate_server.requests.clear()
+
+    exchange.refresh_stale_bases()
+    assert rate_server.total_requests == len(exchange.SUPPORTED_CURRENCIES)
+
+
+def test_serves_last_known_rates_when_upstream_is_down(rate_server, db):
+    exchange.get_rates_for_currencies(db, "USD", ["EUR"])
+    age_rates(db, hours=48)
+    rate_server.failing = True
+
+    rates, _, stale = exchange.get_rates_for_currencies(db, "USD", ["EUR"])
+    assert stale
+    assert rates["EUR"] == pytest.approx(1 / rates_for("USD")["EUR"])
+
+
+def test_no_rates_on_record_and_upstream_down_raises(rate_server, db):
+    rate_server.failing = True
+    with pytest.raises(Exception):
+        exchange.get_rates_for_currencies(db, "USD", ["EUR"])
+
+
+def test_circuit_breaker_stops_calling_failing_upstream(rate_server, db):
+    rate_server.failing = True
+    threshold = exchange.rate_breaker.failure_threshold
+    for _ in range(threshold):
+        with pytest.raises(Exception):
+            exchange.get_rates_for_currencies(db, "USD", ["EUR"])
+    assert rate_server.total_requests == threshold
+
+    with pytest.raises(exchange.ExchangeRateUnavailable):
+        exchange.get_rates_for_currencies(db, "USD", ["EUR"])
+    assert rate_server.total_requests == threshold
+
+
+def test_async_path_uses_fake_server(rate_server, db):
+    rates, _, stale = asyncio.run(exchange.get_rates_for_currencies_async(db, "USD", ["EUR"]))
+    assert not stale
+    assert rates["EUR"] == pytest.approx(1 / rates_for("USD")["EUR"])
+    assert rate_server.requests["USD"] == 1